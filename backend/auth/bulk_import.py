@@ -0,0 +1,206 @@
+import csv
+import json
+import os
+from uuid import uuid4
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal
+from hashing import hasher
+
+# Rows validated, hashed and inserted together, with one commit per batch
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+# Per-row errors listed in the response; the rest are only counted
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+MAX_LINE_BYTES = 64 * 1024
+
+FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def fail(self, line: int, error: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> dict:
+        return {
+            "status": "success",
+            "created": self.created,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+        }
+
+
+class RecordParser:
+    # One record per line: CSV with a header row, or one JSON object per line
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.header = None
+
+    def parse(self, raw: bytes):
+        # Returns a dict, None for lines without a record, or raises ValueError
+        text = raw.decode("utf-8").rstrip("\r")
+        if not text.strip():
+            return None
+        if self.fmt == "ndjson":
+            record = json.loads(text)
+            if not isinstance(record, dict):
+                raise ValueError("expected a JSON object")
+            return record
+        values = next(csv.reader([text]))
+        if self.header is None:
+            self.header = [name.strip() for name in values]
+            return None
+        if len(values) != len(self.header):
+            raise ValueError(f"expected {len(self.header)} columns")
+        return dict(zip(self.header, values))
+
+
+async def read_records(request: Request):
+    # Yields (line number, record or error message) as the body streams in
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    fmt = FORMATS.get(content_type)
+    if fmt is None:
+        raise HTTPException(
+            status_code=415, detail="Send text/csv or application/x-ndjson"
+        )
+    parser = RecordParser(fmt)
+    buffer = b""
+    line = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > MAX_LINE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Line {line + 1} is too long")
+        for raw in lines:
+            line += 1
+            try:
+                record = parser.parse(raw)
+            except ValueError as exc:
+                yield line, f"unreadable line: {exc}"
+                continue
+            if record is not None:
+                yield line, record
+    if buffer:
+        line += 1
+        try:
+            record = parser.parse(buffer)
+        except ValueError as exc:
+            record = f"unreadable line: {exc}"
+        if record is not None:
+            yield line, record
+
+
+def validate(schema, batch, report: ImportReport) -> list:
+    valid = []
+    for line, record in batch:
+        if isinstance(record, str):
+            report.fail(line, record)
+            continue
+        try:
+            valid.append((line, schema.model_validate(record)))
+        except ValidationError as exc:
+            error = exc.errors()[0]
+            field = ".".join(str(part) for part in error["loc"])
+            report.fail(line, f"{field}: {error['msg']}")
+    return valid
+
+
+def drop_duplicates(db, model, unique_fields, items, report: ImportReport) -> list:
+    # Repeats inside the batch first, then one IN query against the table
+    seen = {field: set() for field in unique_fields}
+    unique = []
+    for line, item in items:
+        repeated = [f for f in unique_fields if getattr(item, f) in seen[f]]
+        if repeated:
+            report.fail(line, f"{repeated[0]} repeated in this import")
+            continue
+        for field in unique_fields:
+            seen[field].add(getattr(item, field))
+        unique.append((line, item))
+    if not unique:
+        return []
+
+    columns = [getattr(model, field) for field in unique_fields]
+    taken = {field: set() for field in unique_fields}
+    rows = db.execute(
+        select(*columns).where(
+            or_(*(col.in_(seen[f]) for col, f in zip(columns, unique_fields)))
+        )
+    )
+    for row in rows:
+        for field, value in zip(unique_fields, row):
+            taken[field].add(value)
+
+    fresh = []
+    for line, item in unique:
+        existing = [f for f in unique_fields if getattr(item, f) in taken[f]]
+        if existing:
+            report.fail(line, f"{existing[0]} already registered")
+        else:
+            fresh.append((line, item))
+    return fresh
+
+
+def import_batch(db, model, schema, unique_fields, batch, report: ImportReport):
+    items = drop_duplicates(
+        db, model, unique_fields, validate(schema, batch, report), report
+    )
+    if not items:
+        return
+    hashes = hasher.hash_many([item.password for _, item in items])
+    rows = [
+        (line, dict(item.model_dump(), id=uuid4().bytes, password=hashed))
+        for (line, item), hashed in zip(items, hashes)
+    ]
+    try:
+        db.execute(insert(model), [row for _, row in rows])
+        db.commit()
+        report.created += len(rows)
+        return
+    except IntegrityError:
+        # A concurrent signup took one of the values; retry row by row
+        db.rollback()
+    for line, row in rows:
+        try:
+            db.execute(insert(model), [row])
+            db.commit()
+            report.created += 1
+        except IntegrityError:
+            db.rollback()
+            report.fail(line, "already registered")
+
+
+async def import_accounts(request: Request, model, schema, unique_fields) -> dict:
+    report = ImportReport()
+    db = SessionLocal()
+    try:
+        batch = []
+        async for line, record in read_records(request):
+            batch.append((line, record))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await run_in_threadpool(
+                    import_batch, db, model, schema, unique_fields, batch, report
+                )
+                batch = []
+        if batch:
+            await run_in_threadpool(
+                import_batch, db, model, schema, unique_fields, batch, report
+            )
+    finally:
+        db.close()
+    return report.as_dict()
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from metrics import timed
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_POOL_ENABLED = os.getenv("HASH_POOL_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(os.cpu_count() or 1)))
+# Hash jobs allowed in flight (running + queued) before we shed load with 503
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", str(HASH_POOL_WORKERS * 8)))
+
+# Password hashing context. Hashes stored with a different cost are flagged
+# by deprecated="auto" and rehashed on the next successful login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS
+)
+
+
+# Module-level so they can be pickled into the worker processes
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password: str, hashed: str):
+    # Returns (verified, new_hash); new_hash is set when the cost changed
+    return pwd_context.verify_and_update(password, hashed)
+
+
+class HashPool:
+    # Runs bcrypt in a size-bounded process pool so a login burst can't
+    # starve the threadpool and the GIL for every other endpoint
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _acquire(self, count: int = 1, wait: bool = False):
+        # Requests are shed at the limit; bulk work waits for room instead
+        with self._released:
+            while self.pending + count > self.queue_limit:
+                if not wait:
+                    raise HTTPException(
+                        status_code=503,
+                        detail="Too many password operations in flight",
+                        headers={"Retry-After": "1"},
+                    )
+                self._released.wait()
+            self.pending += count
+
+    def _release(self, count: int = 1):
+        with self._released:
+            self.pending -= count
+            self._released.notify_all()
+
+    def _call(self, fn, *args):
+        # Without a started pool (e.g. HASH_POOL_ENABLED=false) hash inline
+        if self._executor is None:
+            return fn(*args)
+        self._acquire()
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._release()
+
+    async def _call_async(self, fn, *args):
+        if self._executor is None:
+            return await asyncio.to_thread(fn, *args)
+        self._acquire()
+        try:
+            return await asyncio.wrap_future(self._executor.submit(fn, *args))
+        finally:
+            self._release()
+
+    # Timed here rather than in the workers, so queueing counts too
+    def hash(self, password: str) -> str:
+        with timed("password_hash"):
+            return self._call(hash_password, password)
+
+    def verify(self, password: str, hashed: str):
+        with timed("password_verify"):
+            return self._call(verify_password, password, hashed)
+
+    def hash_many(self, passwords) -> list:
+        # Bulk imports: one pool-width slice at a time, so logins submitted
+        # meanwhile wait for a slice rather than the whole batch. Each slice
+        # holds its slots in the in-flight count, so logins are still shed
+        # at the limit rather than queued behind the import.
+        if self._executor is None:
+            return [hash_password(password) for password in passwords]
+        hashes = []
+        size = max(min(self.workers, self.queue_limit), 1)
+        with timed("password_hash_batch"):
+            for start in range(0, len(passwords), size):
+                chunk = passwords[start : start + size]
+                self._acquire(len(chunk), wait=True)
+                try:
+                    hashes.extend(self._executor.map(hash_password, chunk))
+                finally:
+                    self._release(len(chunk))
+        return hashes
+
+    async def hash_async(self, password: str) -> str:
+        with timed("password_hash"):
+            return await self._call_async(hash_password, password)
+
+    async def verify_async(self, password: str, hashed: str):
+        with timed("password_verify"):
+            return await self._call_async(verify_password, password, hashed)
+
+
+hasher = HashPool(HASH_POOL_WORKERS, HASH_QUEUE_LIMIT)
@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from prometheus_client import Counter
+
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+# Max staleness in seconds. Edits invalidate only the worker that served
+# them, so other workers can serve the old profile this long; 0 disables.
+IDENTITY_CACHE_TTL = float(os.getenv("IDENTITY_CACHE_TTL", "30"))
+
+IDENTITY_CACHE_LOOKUPS = Counter(
+    "identity_cache_lookups",
+    "Identity cache lookups for /user/me and /vendor/me",
+    ["kind", "result"],
+)
+
+
+class IdentityCache:
+    # LRU of identities resolved from the DB, keyed by (kind, token subject)
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, subject: str):
+        if self.ttl <= 0:
+            return None
+        key = (kind, subject)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        IDENTITY_CACHE_LOOKUPS.labels(kind, "miss" if entry is None else "hit").inc()
+        return None if entry is None else dict(entry[0])
+
+    def set(self, kind: str, subject: str, identity: dict):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[(kind, subject)] = (
+                dict(identity),
+                time.monotonic() + self.ttl,
+            )
+            self._entries.move_to_end((kind, subject))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, kind: str, *subjects):
+        with self._lock:
+            for subject in subjects:
+                self._entries.pop((kind, subject), None)
+
+
+identity_cache = IdentityCache(IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL)
@@ -0,0 +1,268 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+
+from database import engines, pool_metrics
+from revocation import revocation_list
+
+# Set by the process manager when several workers share one /metrics view
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if PROMETHEUS_MULTIPROC_DIR:
+    # Metric values open their files on creation, below; gunicorn.conf.py
+    # also clears the directory, but one-shot scripts never load it
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+# Opt-in profiler: the fraction of requests sampled, and the latency above
+# which a sampled request's stacks are written out as a flamegraph
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/profiles")
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "route", "status"],
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Time from cursor execute to result, per statement type",
+    ["engine", "statement"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+OPERATION_LATENCY = Histogram(
+    "operation_duration_seconds",
+    "Time spent in expensive operations (hashing, auth calls, rendering)",
+    ["operation", "outcome"],
+)
+
+STATEMENTS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+@contextmanager
+def timed(operation: str):
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        OPERATION_LATENCY.labels(operation, outcome).observe(
+            time.perf_counter() - start
+        )
+
+
+def instrument_engines():
+    for name, engine in engines().items():
+
+        def before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+        def after(conn, cursor, statement, parameters, context, executemany, name=name):
+            start = conn.info["query_start"].pop()
+            verb = statement.lstrip().split(None, 1)[0].upper() if statement else ""
+            DB_QUERY_LATENCY.labels(
+                name, verb if verb in STATEMENTS else "OTHER"
+            ).observe(time.perf_counter() - start)
+
+        def failed(context):
+            # No connection when connecting itself failed
+            if context.connection is None:
+                return
+            starts = context.connection.info.get("query_start")
+            if starts:
+                starts.pop()
+
+        event.listen(engine, "before_cursor_execute", before)
+        event.listen(engine, "after_cursor_execute", after)
+        event.listen(engine, "handle_error", failed)
+
+
+class PoolCollector:
+    # Pool gauges read at scrape time. With several workers each scrape sees
+    # the pools of whichever worker answered it.
+    def collect(self):
+        connections = GaugeMetricFamily(
+            "db_pool_connections",
+            "Pool connections by state",
+            labels=["engine", "state"],
+        )
+        checkouts = CounterMetricFamily(
+            "db_pool_checkouts", "Pool checkouts", labels=["engine", "result"]
+        )
+        wait = CounterMetricFamily(
+            "db_pool_checkout_wait_seconds",
+            "Time spent waiting for a pooled connection",
+            labels=["engine"],
+        )
+        for name, status in pool_metrics().items():
+            for state in ("size", "checked_in", "checked_out", "overflow"):
+                if state in status:
+                    connections.add_metric([name, state], status[state])
+            if "checkouts" in status:
+                checkouts.add_metric([name, "ok"], status["checkouts"])
+                checkouts.add_metric([name, "failed"], status["failed_checkouts"])
+                wait.add_metric([name], status["wait_seconds_total"])
+        yield connections
+        yield checkouts
+        yield wait
+
+
+pool_collector = PoolCollector()
+REGISTRY.register(pool_collector)
+
+
+class RevocationCollector:
+    # Per worker, like the pool gauges: a worker whose copy of the revocation
+    # list stopped syncing shows an old timestamp and a growing failure count
+    def collect(self):
+        synced = GaugeMetricFamily(
+            "revocation_list_last_sync_timestamp_seconds",
+            "Unix time of the last complete revocation list sync",
+        )
+        synced.add_metric([], revocation_list.synced_at)
+        failures = CounterMetricFamily(
+            "revocation_list_sync_failures", "Failed revocation list syncs"
+        )
+        failures.add_metric([], revocation_list.sync_failures)
+        yield synced
+        yield failures
+
+
+revocation_collector = RevocationCollector()
+REGISTRY.register(revocation_collector)
+
+
+def metrics_response() -> Response:
+    registry = REGISTRY
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(pool_collector)
+        registry.register(revocation_collector)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+# Threads parked in these calls are idle and only add noise to a profile
+IDLE_FRAMES = {"wait", "select", "poll", "epoll", "_wait_for_tstate_lock", "get"}
+
+
+class StackSampler(threading.Thread):
+    # Samples the stacks of every other thread into collapsed-stack counts,
+    # the input format of flamegraph.pl and speedscope
+    def __init__(self, interval: float):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or frame.f_code.co_name in IDLE_FRAMES:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                        f":{frame.f_lineno})"
+                    )
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(names))] += 1
+
+    def finish(self) -> Counter:
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+
+class SlowRequestProfiler:
+    # Profiles one sampled request at a time. Stacks of requests running
+    # concurrently end up in the same profile.
+    def __init__(self, rate: float, slow_ms: float, interval_ms: float, out_dir):
+        self.rate = rate
+        self.slow_ms = slow_ms
+        self.interval = interval_ms / 1000
+        self.out_dir = out_dir
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.rate <= 0 or random.random() >= self.rate:
+            return None
+        if not self._lock.acquire(blocking=False):
+            return None
+        sampler = StackSampler(self.interval)
+        sampler.start()
+        return sampler
+
+    def finish(self, sampler, elapsed: float, method: str, route: str):
+        try:
+            stacks = sampler.finish()
+        finally:
+            self._lock.release()
+        if elapsed * 1000 < self.slow_ms or not stacks:
+            return
+        os.makedirs(self.out_dir, exist_ok=True)
+        name = re.sub(r"[^\w.-]+", "_", f"{method}{route}").strip("_")
+        path = os.path.join(
+            self.out_dir,
+            f"{int(time.time() * 1000)}-{name}-{elapsed * 1000:.0f}ms.folded",
+        )
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+profiler = SlowRequestProfiler(
+    PROFILE_SAMPLE_RATE, PROFILE_SLOW_MS, PROFILE_INTERVAL_MS, PROFILE_DIR
+)
+
+
+class MetricsMiddleware:
+    # Pure ASGI so the timing covers streamed bodies to the last chunk
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = [500]
+        sampler = profiler.start()
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            # The route template, so path parameters don't explode the labels
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(scope["method"], route, str(status[0])).observe(
+                elapsed
+            )
+            if sampler is not None:
+                profiler.finish(sampler, elapsed, scope["method"], route)
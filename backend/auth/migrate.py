@@ -0,0 +1,12 @@
+# One-shot schema setup, run once per deploy before the workers start (the
+# service no longer touches the schema on import). The auth tables have no
+# migrations yet; create_all only adds the tables that are missing. That
+# includes token_revocations, which the order service reads too. Only the
+# models are imported, not the app and its metrics.
+import revocation
+from database import engine
+from models import Base
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    revocation.metadata.create_all(bind=engine)
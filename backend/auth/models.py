@@ -0,0 +1,31 @@
+from uuid import uuid4
+
+from sqlalchemy import Column, String
+from sqlalchemy.dialects.mysql import BINARY
+from sqlalchemy.orm import declarative_base
+
+# Tables are created by migrate.py, which imports this module without the app
+Base = declarative_base()
+
+
+class User(Base):
+    __tablename__ = "users"
+    id = Column(BINARY(16), primary_key=True, index=True, default=lambda: uuid4().bytes)
+    role = Column(String(20), default="user")
+    username = Column(String(255), unique=True, index=True)
+    password = Column(String(255))
+    email = Column(String(255), unique=True)
+    gender = Column(String(10))
+    mobile = Column(String(15), unique=True)
+
+
+class Vendor(Base):
+    __tablename__ = "vendors"
+    id = Column(BINARY(16), primary_key=True, index=True, default=lambda: uuid4().bytes)
+    name = Column(String(255), unique=True, index=True)
+    role = Column(String(20), default="vendor")
+    password = Column(String(255))
+    email = Column(String(255), unique=True)
+    gender = Column(String(10))
+    mobile = Column(String(15), unique=True)
+    address = Column(String(255))
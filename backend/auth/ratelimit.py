@@ -0,0 +1,229 @@
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from jose import jwt
+
+from database import env_flag
+
+RATE_LIMIT_ENABLED = env_flag("RATE_LIMIT_ENABLED", "true")
+# "memory" keeps buckets per process; "sqlite" shares them between the
+# workers of one host through RATE_LIMIT_DB_PATH
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "/tmp/ratelimit.sqlite3")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Bodies larger than this are not parsed for body:<field> keys
+MAX_KEY_BODY = 64 * 1024
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_limit(limit: str):
+    # "10/minute" -> refill rate (tokens per second) and burst size
+    count, period = limit.split("/")
+    burst = float(count)
+    return burst / PERIODS[period.strip()], burst
+
+
+def refill(tokens: float, updated_at: float, now: float, rate: float, burst: float):
+    # Takes one token; returns the tokens left and the seconds to wait,
+    # which is 0 when the request is allowed
+    tokens = min(burst, tokens + (now - updated_at) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBackend:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        # Drop buckets that have refilled completely; they hold no state
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if bucket[0] + (now - bucket[1]) * bucket[2] < bucket[3]
+        }
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self._buckets[key] = [burst, now, rate, burst]
+            bucket[0], wait = refill(bucket[0], bucket[1], now, rate, burst)
+            bucket[1] = now
+        return wait
+
+
+class SQLiteBackend:
+    # Buckets in a SQLite file so every worker process sees the same counts
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL, updated_at REAL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _take(self, key: str, rate: float, burst: float) -> float:
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, wait = refill(*(row or (burst, now)), now, rate, burst)
+            conn.execute(
+                "INSERT INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        # Off the event loop: another worker may hold the write lock
+        return await asyncio.to_thread(self._take, key, rate, burst)
+
+
+def make_backend():
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteBackend(RATE_LIMIT_DB_PATH)
+    return MemoryBackend(RATE_LIMIT_MAX_KEYS)
+
+
+class Rule:
+    # One bucket per (route, key value). `key` is "ip", "subject" (the
+    # bearer token's sub) or "body:<field>" (a field of the JSON body).
+    def __init__(self, path: str, limit: str, key: str = "ip", method="POST"):
+        self.method = method
+        self.path = path
+        self.key = key
+        self.rate, self.burst = parse_limit(limit)
+
+
+class RateLimitMiddleware:
+    # Pure ASGI, so requests to routes without rules cost one dict lookup
+    def __init__(self, app, rules, backend=None, secret_key: str = None):
+        self.app = app
+        self.backend = backend or make_backend()
+        self.secret_key = secret_key
+        self.routes = {}
+        for rule in rules:
+            self.routes.setdefault((rule.method, rule.path), []).append(rule)
+
+    async def __call__(self, scope, receive, send):
+        rules = scope["type"] == "http" and self.routes.get(
+            (scope["method"], scope["path"])
+        )
+        if not rules:
+            return await self.app(scope, receive, send)
+
+        body = None
+        if any(rule.key.startswith("body:") for rule in rules):
+            body, receive = await self._read_body(receive)
+
+        wait = 0.0
+        for rule in rules:
+            value = self._key_value(rule.key, scope, body)
+            if value is None:
+                continue
+            bucket = f"{rule.method} {rule.path}|{rule.key}|{value}"
+            wait = max(wait, await self.backend.take(bucket, rule.rate, rule.burst))
+        if wait > 0:
+            return await self._reject(send, wait)
+        await self.app(scope, receive, send)
+
+    async def _read_body(self, receive):
+        # Buffer the body so it can be inspected, then replay it to the app
+        messages = []
+        chunks = []
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+
+        async def replay():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        raw = b"".join(chunks)
+        body = None
+        if len(raw) <= MAX_KEY_BODY:
+            try:
+                body = json.loads(raw)
+            except ValueError:
+                pass
+        return (body if isinstance(body, dict) else None), replay
+
+    def _key_value(self, key: str, scope, body):
+        if key == "ip":
+            # uvicorn --proxy-headers puts the forwarded address here
+            client = scope.get("client")
+            return client[0] if client else None
+        if key == "subject":
+            return self._subject(scope)
+        if key.startswith("body:") and body is not None:
+            value = body.get(key[5:])
+            return str(value) if value is not None else None
+        return None
+
+    def _subject(self, scope):
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                token = value.decode("latin-1")
+                if not token.startswith("Bearer "):
+                    return None
+                try:
+                    claims = jwt.decode(
+                        token[7:], self.secret_key, algorithms=["HS256"]
+                    )
+                except jwt.JWTError:
+                    # The endpoint rejects it; there is no subject to count
+                    return None
+                return claims.get("sub")
+        return None
+
+    async def _reject(self, send, wait: float):
+        body = b'{"detail":"Too many requests"}'
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(1, math.ceil(wait))).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import (
+    Column,
+    Double,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    delete,
+    insert,
+    select,
+)
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal
+
+# Seconds between reads of the table tail: how long a revocation made in one
+# worker takes to reach the others (and the other service)
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", "5"))
+REVOCATION_BATCH_SIZE = int(os.getenv("REVOCATION_BATCH_SIZE", "1000"))
+# Ids are allocated at insert but become visible at commit; rows younger than
+# this are applied but read again, so a lower id committing late isn't skipped
+REVOCATION_SETTLE_MS = float(os.getenv("REVOCATION_SETTLE_MS", "1000"))
+# /health/ready fails once the list has gone this long without a sync
+REVOCATION_MAX_STALENESS = float(
+    os.getenv("REVOCATION_MAX_STALENESS", str(3 * REVOCATION_SYNC_INTERVAL))
+)
+
+logger = logging.getLogger(__name__)
+
+# Shared by both services and written by the auth service, whose migrate.py
+# creates it. Kept off the services' model metadata so the order migrations
+# leave it alone.
+metadata = MetaData()
+token_revocations = Table(
+    "token_revocations",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    # Either a single token (jti), or every token of kind/subject issued
+    # before revoked_at (jti NULL)
+    Column("jti", String(32), unique=True),
+    Column("kind", String(10)),
+    Column("subject", String(255)),
+    Column("revoked_at", Double, nullable=False),
+    # Once every token the row covers has expired it can go
+    Column("expires_at", Double, nullable=False, index=True),
+)
+
+REVOCATION_COLUMNS = (
+    token_revocations.c.id,
+    token_revocations.c.jti,
+    token_revocations.c.kind,
+    token_revocations.c.subject,
+    token_revocations.c.revoked_at,
+    token_revocations.c.expires_at,
+)
+
+
+def token_revocation(claims: dict) -> dict:
+    return {
+        "jti": claims["jti"],
+        "kind": claims.get("kind"),
+        "subject": claims.get("sub"),
+        "revoked_at": time.time(),
+        "expires_at": float(claims["exp"]),
+    }
+
+
+def subject_revocation(kind: str, subject: str, lifetime: float) -> dict:
+    # `lifetime`: the longest a token issued before now can still be valid
+    now = time.time()
+    return {
+        "jti": None,
+        "kind": kind,
+        "subject": subject,
+        "revoked_at": now,
+        "expires_at": now + lifetime,
+    }
+
+
+def revoke(db: Session, entries):
+    # Commits the caller's pending changes in the same transaction, so e.g. a
+    # password change and the revocation of the old tokens land together
+    if entries:
+        db.execute(insert(token_revocations), entries)
+    db.commit()
+    revocation_list.add(entries)
+
+
+def revocations_after(after: int, limit: int):
+    with SessionLocal() as db:
+        return db.execute(
+            select(*REVOCATION_COLUMNS)
+            .where(token_revocations.c.id > after)
+            .order_by(token_revocations.c.id)
+            .limit(limit)
+        ).all()
+
+
+def purge_expired(db: Session):
+    db.execute(
+        delete(token_revocations).where(token_revocations.c.expires_at < time.time())
+    )
+    db.commit()
+
+
+class RevocationList:
+    # In-memory mirror of token_revocations, so checking a token is two dict
+    # lookups instead of a query. Each worker tails the table by id.
+    def __init__(self, interval: float):
+        self.interval = interval
+        # jti -> expires_at
+        self.jtis = {}
+        # (kind, subject) -> (revoked_at, expires_at)
+        self.cutoffs = {}
+        self.last_id = 0
+        # Time of the last sync that read the whole tail, and failed syncs
+        self.synced_at = 0.0
+        self.sync_failures = 0
+        self._lock = threading.Lock()
+        self._task = None
+
+    def is_revoked(self, claims: dict) -> bool:
+        jti = claims.get("jti")
+        if jti is not None and jti in self.jtis:
+            return True
+        cutoff = self.cutoffs.get((claims.get("kind"), claims.get("sub")))
+        # Tokens without iat predate revocation support and count as old
+        return cutoff is not None and float(claims.get("iat") or 0) < cutoff[0]
+
+    def add(self, entries):
+        with self._lock:
+            for entry in entries:
+                if entry["jti"]:
+                    self.jtis[entry["jti"]] = entry["expires_at"]
+                    continue
+                key = (entry["kind"], entry["subject"])
+                current = self.cutoffs.get(key)
+                if current is None or entry["revoked_at"] > current[0]:
+                    self.cutoffs[key] = (entry["revoked_at"], entry["expires_at"])
+
+    def prune(self):
+        now = time.time()
+        with self._lock:
+            self.jtis = {
+                jti: expires for jti, expires in self.jtis.items() if expires > now
+            }
+            self.cutoffs = {
+                key: cutoff for key, cutoff in self.cutoffs.items() if cutoff[1] > now
+            }
+
+    def sync(self) -> int:
+        # Reads everything after last_id; returns how many rows were read
+        read = 0
+        started = time.time()
+        settled = started - REVOCATION_SETTLE_MS / 1000
+        after = self.last_id
+        advancing = True
+        while True:
+            rows = revocations_after(after, REVOCATION_BATCH_SIZE)
+            self.add([row._mapping for row in rows])
+            read += len(rows)
+            for row in rows:
+                advancing = advancing and row.revoked_at <= settled
+                if advancing:
+                    self.last_id = row.id
+            if len(rows) < REVOCATION_BATCH_SIZE:
+                self.synced_at = started
+                return read
+            after = rows[-1].id
+
+    async def start(self):
+        # Loaded before the worker serves anything, so a restart never
+        # forgets a revocation
+        await run_in_threadpool(self.sync)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await run_in_threadpool(self.sync)
+                self.prune()
+            except Exception:
+                # Keeps serving the last copy; stale() reports it to /health/ready
+                self.sync_failures += 1
+                logger.exception("Revocation list sync failed")
+
+    def stale(self) -> bool:
+        return time.time() - self.synced_at > REVOCATION_MAX_STALENESS
+
+
+revocation_list = RevocationList(REVOCATION_SYNC_INTERVAL)
@@ -0,0 +1,51 @@
+import os
+import time
+from uuid import uuid4
+
+from fastapi import HTTPException
+from jose import jwt
+
+from revocation import revocation_list
+
+SECRET_KEY = os.getenv("SECRET_KEY", "waste_mgmt_project_secret_key")
+ALGORITHM = "HS256"
+# Access tokens are checked locally by both services, so keep them short;
+# clients trade the refresh token for a new pair at POST /token/refresh
+ACCESS_TOKEN_EXPIRE_MINUTES = float(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+
+ACCESS_TOKEN_TTL = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+REFRESH_TOKEN_TTL = REFRESH_TOKEN_EXPIRE_DAYS * 86400
+
+
+def encode_token(claims: dict, typ: str, ttl: float) -> str:
+    # iat is fractional so a revocation cuts off exactly the tokens issued
+    # before it, even within the same second
+    now = time.time()
+    payload = dict(claims, typ=typ, jti=uuid4().hex, iat=now, exp=int(now + ttl))
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def issue_tokens(claims: dict) -> dict:
+    # The refresh token only names the account; fresh claims are read from
+    # the DB when it is used
+    refresh_claims = {"sub": claims["sub"], "kind": claims["kind"]}
+    return {
+        "access_token": encode_token(claims, "access", ACCESS_TOKEN_TTL),
+        "refresh_token": encode_token(refresh_claims, "refresh", REFRESH_TOKEN_TTL),
+        "token_type": "bearer",
+        "expires_in": int(ACCESS_TOKEN_TTL),
+    }
+
+
+def decode_token(token: str, typ: str = "access") -> dict:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.JWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    # Tokens issued before refresh tokens existed carry no typ: access only
+    if payload.get("typ", "access") != typ:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if revocation_list.is_revoked(payload):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    return payload
@@ -0,0 +1,631 @@
+"""Benchmark harness for the auth and order services.
+
+    python bench.py list
+    python bench.py run --suite default
+    python bench.py run --case order.create_order:items=10 --requests 500
+    python bench.py compare results/old.json results/new.json
+    python bench.py startup --service order --workers 4
+
+Every case runs in its own process against a fresh SQLite database (or the
+scratch database given with --database-url, whose tables are dropped and
+recreated), with the app driven in-process through httpx's ASGI transport.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIRS = {
+    "auth": os.path.join(HERE, "..", "auth"),
+    "order": os.path.join(HERE, "..", "order"),
+}
+RESULTS_DIR = os.path.join(HERE, "results")
+
+# Applied to every case before the service is imported. Rate limiting is
+# off so a login burst from one client measures bcrypt, not 429s.
+BASE_ENV = {
+    "RATE_LIMIT_ENABLED": "false",
+    "INVOICE_POLL_INTERVAL": "0.05",
+}
+
+
+def case(name: str, requests: int = None, env: dict = None, **params) -> dict:
+    service, scenario = name.split(".")
+    return {
+        "service": service,
+        "scenario": scenario,
+        "params": {key: str(value) for key, value in params.items()},
+        "env": env or {},
+        "requests": requests,
+    }
+
+
+SUITES = {
+    "default": [
+        case("auth.login", requests=200),
+        case("order.create_order", items=3),
+        case("order.vendor_orders"),
+        case("order.user_orders"),
+        case("order.catalog"),
+        case("order.mix"),
+    ],
+    # bcrypt in the process pool versus inline in the threadpool
+    "login": [
+        case("auth.login", requests=200, env={"HASH_POOL_ENABLED": "true"}),
+        case("auth.login", requests=200, env={"HASH_POOL_ENABLED": "false"}),
+        case("auth.signup", requests=200),
+    ],
+    # One multi-row INSERT regardless of item count
+    "order-items": [
+        case("order.create_order", items=1),
+        case("order.create_order", items=10),
+        case("order.create_order", items=100),
+    ],
+    "async": [
+        case("order.create_order", items=3, env={"ASYNC_DB": "true"}),
+        case("order.vendor_orders", env={"ASYNC_DB": "true"}),
+        case("auth.login", requests=200, env={"ASYNC_DB": "true"}),
+    ],
+    "invoice": [
+        case("order.invoice_render", requests=50, path="tempfile"),
+        case("order.invoice_render", requests=50, path="memory"),
+        case("order.invoice_download"),
+    ],
+    "listing": [
+        case("order.listing", requests=5, rows=10000, path="orm"),
+        case("order.listing", requests=5, rows=10000, path="columns"),
+        case("order.listing", requests=3, rows=100000, path="orm"),
+        case("order.listing", requests=3, rows=100000, path="columns"),
+    ],
+    # Per-item orders rows versus order_headers + order_items
+    "schema": [
+        case("order.schema", requests=200, layout="legacy"),
+        case("order.schema", requests=200, layout="headers"),
+    ],
+    # Ranked full-text index lookups versus LIKE scans of the vendor's area;
+    # run with --orders 1000000
+    "search": [
+        case("order.search", requests=200, engine="like", q="copper"),
+        case("order.search", requests=200, engine="index", q="copper"),
+        case("order.search", requests=200, engine="like", q="sector 14"),
+        case("order.search", requests=200, engine="index", q="sector 14"),
+        case("order.search", requests=200, engine="like", q="house 123 sector"),
+        case("order.search", requests=200, engine="index", q="house 123 sector"),
+        case("order.search", requests=200, engine="like", q="copp"),
+        case("order.search", requests=200, engine="index", q="copp"),
+    ],
+    "route": [
+        case("order.route", requests=20, stops=100),
+        case("order.route", requests=10, stops=1000),
+        case("order.route", requests=10, stops=1000, cluster="on"),
+        case("order.route", requests=5, stops=5000),
+        case("order.route", requests=5, stops=5000, cluster="off"),
+    ],
+    "ratelimit": [
+        case("auth.ratelimit", requests=100000, route="unmatched"),
+        case("auth.ratelimit", requests=100000, route="matched"),
+        case(
+            "auth.ratelimit",
+            requests=10000,
+            route="matched",
+            env={"RATE_LIMIT_BACKEND": "sqlite"},
+        ),
+    ],
+    # order -> auth lookups against a stub auth server: shared pool versus a
+    # client per lookup, coalescing on/off, and fail-fast with the breaker open
+    "auth-client": [
+        case("order.auth_lookup", requests=20, pool="off"),
+        case("order.auth_lookup", requests=200, coalesce="off"),
+        case("order.auth_lookup", requests=200, coalesce="on"),
+        case("order.auth_lookup", requests=200, breaker="open"),
+    ],
+    # In-memory revocation check versus a query per request, and rotation
+    "tokens": [
+        case("auth.refresh", requests=500),
+        case("auth.revocation", requests=100000, check="memory"),
+        case("auth.revocation", requests=10000, check="query"),
+    ],
+}
+SUITES["all"] = [c for name, cases in SUITES.items() for c in cases]
+
+
+def case_name(c: dict) -> str:
+    labels = [f"{k}={v}" for k, v in sorted(c["params"].items())]
+    labels += [f"{k}={v}" for k, v in sorted(c["env"].items())]
+    name = f"{c['service']}.{c['scenario']}"
+    return f"{name}[{','.join(labels)}]" if labels else name
+
+
+def parse_case(spec: str) -> dict:
+    # "order.create_order:items=10,limit=5"
+    name, _, raw = spec.partition(":")
+    params = dict(item.split("=", 1) for item in raw.split(",") if item)
+    return case(name, **params)
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: list, statuses, duration: float, round_trips: int):
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "requests": count,
+        "errors": sum(n for status, n in statuses.items() if status >= 400),
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "duration_s": round(duration, 4),
+        "rps": round(count / duration, 2) if duration else 0.0,
+        "latency_ms": {
+            "mean": round(sum(ordered) / count * 1000, 3) if count else 0.0,
+            "p50": round(percentile(ordered, 0.50) * 1000, 3),
+            "p95": round(percentile(ordered, 0.95) * 1000, 3),
+            "p99": round(percentile(ordered, 0.99) * 1000, 3),
+            "max": round(ordered[-1] * 1000, 3) if count else 0.0,
+        },
+        "db_round_trips_per_request": round(round_trips / count, 3) if count else 0,
+    }
+
+
+class RoundTrips:
+    # Counts cursor executions on every engine of the service under test
+    def __init__(self):
+        self.count = 0
+
+    def install(self):
+        from sqlalchemy import event
+
+        from database import engines
+
+        for engine in engines().values():
+            event.listen(engine, "before_cursor_execute", self._hit)
+
+    def _hit(self, *args):
+        self.count += 1
+
+
+async def drive_http(app, make_request, total: int, warmup: int, concurrency: int):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def send(i: int):
+            method, url, kwargs = make_request(i)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            return time.perf_counter() - start, response.status_code
+
+        for i in range(warmup):
+            await send(i)
+        round_trips.count = 0
+
+        latencies = []
+        statuses = Counter()
+        indexes = iter(range(warmup, warmup + total))
+
+        async def worker():
+            for i in indexes:
+                elapsed, status = await send(i)
+                latencies.append(elapsed)
+                statuses[status] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        duration = time.perf_counter() - start
+    return latencies, statuses, duration
+
+
+async def drive_micro(operation, total: int, warmup: int):
+    is_async = asyncio.iscoroutinefunction(operation)
+    for i in range(warmup):
+        if is_async:
+            await operation(i)
+        else:
+            operation(i)
+    round_trips.count = 0
+    latencies = []
+    start = time.perf_counter()
+    for i in range(total):
+        began = time.perf_counter()
+        if is_async:
+            await operation(i)
+        else:
+            operation(i)
+        latencies.append(time.perf_counter() - began)
+    return latencies, Counter(), time.perf_counter() - start
+
+
+round_trips = RoundTrips()
+
+
+async def execute(c: dict, options: dict) -> dict:
+    import main
+    import revocation
+    from database import engine
+    from models import Base
+    from scenarios import SCENARIOS, Context
+
+    scenario = SCENARIOS[(c["service"], c["scenario"])]
+    # token_revocations is created by the auth service but read by both
+    for metadata in (Base.metadata, revocation.metadata):
+        if options["reset_db"]:
+            metadata.drop_all(bind=engine)
+        metadata.create_all(bind=engine)
+
+    total = c["requests"] or options["requests"]
+    warmup = min(options["warmup"], total)
+    ctx = Context(main, c["params"], options["scale"], options["seed"])
+    async with main.app.router.lifespan_context(main.app):
+        target = scenario.setup(ctx)
+        round_trips.install()
+        if scenario.kind == "http":
+            latencies, statuses, duration = await drive_http(
+                main.app, target, total, warmup, options["concurrency"]
+            )
+        else:
+            latencies, statuses, duration = await drive_micro(target, total, warmup)
+    result = {"name": case_name(c), **c}
+    result.update(summarize(latencies, statuses, duration, round_trips.count))
+    if scenario.kind == "micro":
+        del result["db_round_trips_per_request"]
+        del result["statuses"]
+    result["extra"] = ctx.extra
+    return result
+
+
+def run_case(c: dict, options: dict, conn):
+    # Child process: configure the environment, then import the service
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    env = {
+        "DATABASE_URL": options["database_url"]
+        or f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "INVOICE_DB_PATH": os.path.join(workdir, "invoices.sqlite3"),
+        "RATE_LIMIT_DB_PATH": os.path.join(workdir, "ratelimit.sqlite3"),
+        "PROFILE_DIR": os.path.join(workdir, "profiles"),
+    }
+    env.update(BASE_ENV)
+    env.update(options["env"])
+    env.update(c["env"])
+    os.environ.update(env)
+    service_dir = os.path.abspath(SERVICE_DIRS[c["service"]])
+    sys.path[:0] = [service_dir, HERE]
+    os.chdir(service_dir)
+    try:
+        conn.send(asyncio.run(execute(c, options)))
+    except BaseException as exc:
+        conn.send({"name": case_name(c), **c, "failed": f"{type(exc).__name__}: {exc}"})
+        raise
+
+
+def run_in_process(c: dict, options: dict) -> dict:
+    context = multiprocessing.get_context("spawn")
+    parent, child = context.Pipe(duplex=False)
+    process = context.Process(target=run_case, args=(c, options, child))
+    process.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = {"name": case_name(c), **c, "failed": "benchmark process died"}
+    process.join()
+    return result
+
+
+def git_revision() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(
+                ["git", *args], cwd=HERE, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "-s"))}
+
+
+def print_result(result: dict):
+    if "failed" in result:
+        print(f"{result['name']:<60} FAILED {result['failed']}")
+        return
+    latency = result["latency_ms"]
+    round_trip = result.get("db_round_trips_per_request", "-")
+    print(
+        f"{result['name']:<60} {result['rps']:>10.1f} rps  "
+        f"p50 {latency['p50']:>9.3f}  p95 {latency['p95']:>9.3f}  "
+        f"p99 {latency['p99']:>9.3f} ms  db/req {round_trip}"
+        + (f"  statuses {result['statuses']}" if result.get("errors") else "")
+        + (f"  {json.dumps(result['extra'])}" if result["extra"] else "")
+    )
+
+
+def command_run(args):
+    if args.case:
+        cases = [parse_case(spec) for spec in args.case]
+    else:
+        cases = SUITES[args.suite]
+    options = {
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "concurrency": args.concurrency,
+        "database_url": args.database_url,
+        "reset_db": bool(args.database_url),
+        "seed": args.seed,
+        "scale": {"users": args.users, "vendors": args.vendors, "orders": args.orders},
+        "env": dict(item.split("=", 1) for item in args.env),
+    }
+    if args.requests_override:
+        for c in cases:
+            c["requests"] = None
+
+    results = []
+    for c in cases:
+        result = run_in_process(c, options)
+        print_result(result)
+        results.append(result)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **git_revision(),
+        "python": sys.version.split()[0],
+        "options": options,
+        "results": results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        commit = (report["commit"] or "unknown")[:8]
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{commit}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {output}")
+    return 1 if any("failed" in r for r in results) else 0
+
+
+SERVERS = {
+    "gunicorn": ["gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+    "uvicorn": ["uvicorn", "main:app"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, deadline: float) -> bool:
+    import httpx
+
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    return False
+
+
+def memory(process) -> dict:
+    info = process.memory_full_info()
+    return {"rss": info.rss, "pss": info.pss, "uss": info.uss}
+
+
+def command_startup(args):
+    # Migrates a fresh SQLite database, starts the server and times the first
+    # answer from /health/live. Memory is read once every worker is up and has
+    # served a few requests; PSS/USS show how much of a worker is shared.
+    import httpx
+    import psutil
+
+    service_dir = os.path.abspath(SERVICE_DIRS[args.service])
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    port = free_port()
+    env = dict(os.environ)
+    env.update(BASE_ENV)
+    env.update(
+        {
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+            "INVOICE_DB_PATH": os.path.join(workdir, "invoices.sqlite3"),
+            "RATE_LIMIT_DB_PATH": os.path.join(workdir, "ratelimit.sqlite3"),
+            "PROMETHEUS_MULTIPROC_DIR": os.path.join(workdir, "prometheus"),
+            "WEB_CONCURRENCY": str(args.workers),
+            "PRELOAD_APP": "false" if args.no_preload else "true",
+            "BIND": f"127.0.0.1:{port}",
+        }
+    )
+    env.update(dict(item.split("=", 1) for item in args.env))
+    os.makedirs(env["PROMETHEUS_MULTIPROC_DIR"])
+
+    began = time.perf_counter()
+    # The auth service creates token_revocations, which the order service reads
+    for name in dict.fromkeys(["auth", args.service]):
+        subprocess.run(
+            [sys.executable, "migrate.py"],
+            cwd=os.path.abspath(SERVICE_DIRS[name]),
+            env=env,
+            check=True,
+        )
+    migrate_seconds = time.perf_counter() - began
+
+    command = list(SERVERS[args.server])
+    if args.server == "uvicorn":
+        command += ["--port", str(port), "--workers", str(args.workers)]
+    base = f"http://127.0.0.1:{port}"
+    began = time.perf_counter()
+    server = subprocess.Popen(command, cwd=service_dir, env=env)
+    try:
+        if not wait_for(f"{base}/health/live", began + args.timeout):
+            print("server did not answer /health/live")
+            return 1
+        first_response = time.perf_counter() - began
+
+        master = psutil.Process(server.pid)
+        workers = [master]
+        if args.server == "gunicorn" or args.workers > 1:
+            while time.perf_counter() < began + args.timeout:
+                workers = master.children()
+                if len(workers) >= args.workers:
+                    break
+                time.sleep(0.02)
+        all_up = time.perf_counter() - began
+        # Enough requests that every worker has handled some
+        for _ in range(args.requests):
+            httpx.get(f"{base}/health/ready", timeout=5)
+        time.sleep(0.5)
+
+        per_worker = [memory(worker) for worker in workers]
+        result = {
+            "service": args.service,
+            "server": args.server,
+            "workers": args.workers,
+            "preload": not args.no_preload,
+            "migrate_seconds": round(migrate_seconds, 3),
+            "first_response_seconds": round(first_response, 3),
+            "all_workers_seconds": round(all_up, 3),
+            "master": memory(master) if workers[0] is not master else None,
+            "per_worker": per_worker,
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    mib = 1024 * 1024
+    print(
+        f"{args.service} {args.server} workers={args.workers} "
+        f"preload={result['preload']}: migrate {result['migrate_seconds']}s, "
+        f"first response {result['first_response_seconds']}s, "
+        f"all workers {result['all_workers_seconds']}s"
+    )
+    for key in ("rss", "pss", "uss"):
+        values = [worker[key] / mib for worker in per_worker]
+        print(
+            f"  worker {key}  mean {sum(values) / len(values):7.1f} MiB  "
+            f"total {sum(values):7.1f} MiB"
+        )
+    if result["master"]:
+        print(f"  master pss {result['master']['pss'] / mib:7.1f} MiB")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved {args.output}")
+    return 0
+
+
+def command_compare(args):
+    def load(path):
+        with open(path) as f:
+            report = json.load(f)
+        return report, {r["name"]: r for r in report["results"] if "failed" not in r}
+
+    old_report, old = load(args.old)
+    new_report, new = load(args.new)
+    print(f"old {old_report.get('commit')}  new {new_report.get('commit')}")
+
+    def change(before, after):
+        return f"{(after - before) / before * 100:+7.1f}%" if before else "    n/a"
+
+    for name in new:
+        if name not in old:
+            continue
+        a, b = old[name], new[name]
+        print(
+            f"{name:<60} rps {change(a['rps'], b['rps'])}  "
+            f"p95 {change(a['latency_ms']['p95'], b['latency_ms']['p95'])}  "
+            f"p99 {change(a['latency_ms']['p99'], b['latency_ms']['p99'])}"
+        )
+
+
+def command_list(args):
+    sys.path.insert(0, HERE)
+    from scenarios import SCENARIOS
+
+    for (service, name), scenario in sorted(SCENARIOS.items()):
+        summary = scenario.doc.splitlines()[0] if scenario.doc else ""
+        print(f"{service}.{name:<20} {scenario.kind:<6} {summary}")
+    print()
+    for name, cases in SUITES.items():
+        print(f"suite {name}: {', '.join(case_name(c) for c in cases)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run a suite or single cases")
+    run.add_argument("--suite", choices=sorted(SUITES), default="default")
+    run.add_argument(
+        "--case",
+        action="append",
+        help="service.scenario[:param=value,...]; repeatable, overrides --suite",
+    )
+    run.add_argument("--requests", type=int, default=1000)
+    run.add_argument(
+        "--requests-override",
+        action="store_true",
+        help="use --requests even for cases with their own request count",
+    )
+    run.add_argument("--warmup", type=int, default=20)
+    run.add_argument("--concurrency", type=int, default=16)
+    run.add_argument("--users", type=int, default=1000)
+    run.add_argument("--vendors", type=int, default=20)
+    run.add_argument("--orders", type=int, default=20000)
+    run.add_argument("--seed", type=int, default=1)
+    run.add_argument(
+        "--database-url",
+        help="scratch database (e.g. local MySQL); its tables are dropped",
+    )
+    run.add_argument(
+        "--env", action="append", default=[], help="KEY=VALUE for every case"
+    )
+    run.add_argument("--output", help="results file (default: results/<time>.json)")
+    run.set_defaults(handler=command_run)
+
+    compare = commands.add_parser("compare", help="compare two results files")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.set_defaults(handler=command_compare)
+
+    startup = commands.add_parser(
+        "startup", help="cold start and per-worker memory under a real server"
+    )
+    startup.add_argument("--service", choices=sorted(SERVICE_DIRS), default="order")
+    startup.add_argument("--server", choices=sorted(SERVERS), default="gunicorn")
+    startup.add_argument("--workers", type=int, default=4)
+    startup.add_argument(
+        "--no-preload", action="store_true", help="import the app in every worker"
+    )
+    startup.add_argument("--requests", type=int, default=50)
+    startup.add_argument("--timeout", type=float, default=60)
+    startup.add_argument(
+        "--env", action="append", default=[], help="KEY=VALUE for the server"
+    )
+    startup.add_argument("--output", help="write the result as JSON")
+    startup.set_defaults(handler=command_startup)
+
+    listing = commands.add_parser("list", help="list scenarios and suites")
+    listing.set_defaults(handler=command_list)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args) or 0)
+
+
+if __name__ == "__main__":
+    main()
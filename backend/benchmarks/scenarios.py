@@ -0,0 +1,976 @@
+"""Benchmark scenarios for the auth and order services.
+
+Each scenario runs inside a fresh process where the service directory is
+first on sys.path, so `main`, `database` etc. are that service's modules.
+`setup(ctx)` seeds what it needs and returns either a request factory
+(HTTP scenarios, driven through the app in-process) or an operation to
+call repeatedly (micro scenarios).
+"""
+
+import base64
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import insert
+
+PASSWORD = "benchmark-password"
+TOKEN_TTL = timedelta(hours=2)
+
+SCENARIOS = {}
+
+
+class Scenario:
+    def __init__(self, service: str, name: str, kind: str, setup, doc: str):
+        self.service = service
+        self.name = name
+        self.kind = kind
+        self.setup = setup
+        self.doc = doc
+
+
+def scenario(service: str, name: str, kind: str = "http"):
+    def register(setup):
+        SCENARIOS[(service, name)] = Scenario(
+            service, name, kind, setup, (setup.__doc__ or "").strip()
+        )
+        return setup
+
+    return register
+
+
+class Context:
+    def __init__(self, main, params: dict, scale: dict, seed: int):
+        self.main = main
+        self.params = params
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.extra = {}
+
+    def param(self, name: str, default):
+        return type(default)(self.params.get(name, default))
+
+
+def token(secret_key: str, claims: dict) -> str:
+    from jose import jwt
+
+    claims = dict(claims, exp=datetime.utcnow() + TOKEN_TTL)
+    return jwt.encode(claims, secret_key, algorithm="HS256")
+
+
+def bearer(value: str) -> dict:
+    return {"Authorization": f"Bearer {value}"}
+
+
+# -- auth service -------------------------------------------------------------
+
+
+def seed_accounts(ctx: Context):
+    from database import SessionLocal
+    from hashing import hash_password
+
+    main = ctx.main
+    # One bcrypt hash shared by every account keeps seeding fast
+    hashed = hash_password(PASSWORD)
+    users = ctx.scale["users"]
+    vendors = ctx.scale["vendors"]
+    with SessionLocal() as db:
+        for start in range(0, users, 5000):
+            db.execute(
+                insert(main.User),
+                [
+                    {
+                        "id": uuid4().bytes,
+                        "role": "user",
+                        "username": f"user{i}",
+                        "password": hashed,
+                        "email": f"user{i}@example.com",
+                        "gender": "other",
+                        "mobile": f"1{i:09d}",
+                    }
+                    for i in range(start, min(start + 5000, users))
+                ],
+            )
+        if vendors:
+            db.execute(
+                insert(main.Vendor),
+                [
+                    {
+                        "id": uuid4().bytes,
+                        "role": "vendor",
+                        "name": f"vendor{i}",
+                        "password": hashed,
+                        "email": f"vendor{i}@example.com",
+                        "gender": "other",
+                        "mobile": f"2{i:09d}",
+                        "address": f"{i} Market Road",
+                    }
+                    for i in range(vendors)
+                ],
+            )
+        db.commit()
+
+
+@scenario("auth", "login")
+def auth_login(ctx: Context):
+    """POST /user/login for seeded users (one bcrypt verify each)."""
+    seed_accounts(ctx)
+    users = ctx.scale["users"]
+
+    def request(i: int):
+        body = {"username": f"user{i % users}", "password": PASSWORD}
+        return "POST", "/user/login", {"json": body}
+
+    return request
+
+
+@scenario("auth", "vendor_login")
+def auth_vendor_login(ctx: Context):
+    """POST /vendor/login for seeded vendors."""
+    seed_accounts(ctx)
+    vendors = ctx.scale["vendors"]
+
+    def request(i: int):
+        body = {"email": f"vendor{i % vendors}@example.com", "password": PASSWORD}
+        return "POST", "/vendor/login", {"json": body}
+
+    return request
+
+
+@scenario("auth", "signup")
+def auth_signup(ctx: Context):
+    """POST /user/signup with fresh accounts (one bcrypt hash each)."""
+    seed_accounts(ctx)
+
+    def request(i: int):
+        body = {
+            "username": f"new{i}",
+            "password": PASSWORD,
+            "email": f"new{i}@example.com",
+            "gender": "other",
+            "mobile": f"3{i:09d}",
+        }
+        return "POST", "/user/signup", {"json": body}
+
+    return request
+
+
+@scenario("auth", "me")
+def auth_me(ctx: Context):
+    """GET /user/me with a valid token, as the order service used to call it."""
+    seed_accounts(ctx)
+    main = ctx.main
+    users = min(ctx.scale["users"], 1000)
+    headers = [
+        bearer(token(main.SECRET_KEY, {"sub": f"user{i}", "role": "user"}))
+        for i in range(users)
+    ]
+
+    def request(i: int):
+        return "GET", "/user/me", {"headers": headers[i % users]}
+
+    return request
+
+
+@scenario("auth", "refresh")
+def auth_refresh(ctx: Context):
+    """POST /token/refresh, each with an unused refresh token (one rotation)."""
+    from tokens import issue_tokens
+
+    seed_accounts(ctx)
+    users = min(ctx.scale["users"], 1000)
+
+    def request(i: int):
+        claims = {"sub": f"user{i % users}", "kind": "user"}
+        body = {"refresh_token": issue_tokens(claims)["refresh_token"]}
+        return "POST", "/token/refresh", {"json": body}
+
+    return request
+
+
+@scenario("auth", "revocation", kind="micro")
+def auth_revocation(ctx: Context):
+    """Revocation check of a live token; params check=memory|query, revoked=N.
+
+    `query` is the per-request alternative: one lookup by jti on the
+    table's unique index.
+    """
+    from database import SessionLocal
+    from revocation import revocation_list, token_revocation, token_revocations
+    from sqlalchemy import select
+
+    revoked = ctx.param("revoked", 10000)
+    now = time.time()
+    with SessionLocal() as db:
+        for start in range(0, revoked, 5000):
+            db.execute(
+                insert(token_revocations),
+                [
+                    token_revocation(
+                        {
+                            "jti": uuid4().hex,
+                            "kind": "user",
+                            "sub": f"user{i}",
+                            "exp": now + 3600,
+                        }
+                    )
+                    for i in range(start, min(start + 5000, revoked))
+                ],
+            )
+        db.commit()
+    revocation_list.sync()
+    claims = [
+        {"jti": uuid4().hex, "kind": "user", "sub": f"user{i}", "iat": now}
+        for i in range(1000)
+    ]
+
+    if ctx.params.get("check", "memory") == "memory":
+
+        def operation(i: int):
+            revocation_list.is_revoked(claims[i % 1000])
+
+        return operation
+
+    db = SessionLocal()
+
+    def operation(i: int):
+        db.execute(
+            select(token_revocations.c.id).where(
+                token_revocations.c.jti == claims[i % 1000]["jti"]
+            )
+        ).first()
+
+    return operation
+
+
+@scenario("auth", "ratelimit", kind="micro")
+def auth_ratelimit(ctx: Context):
+    """RateLimitMiddleware overhead per request; params route=matched|unmatched."""
+    from ratelimit import RateLimitMiddleware, Rule
+
+    async def app(scope, receive, send):
+        pass
+
+    middleware = RateLimitMiddleware(app, [Rule("/user/login", "1000000/second")])
+    path = "/user/login" if ctx.params.get("route", "matched") == "matched" else "/"
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "headers": [],
+        "client": ("10.0.0.1", 40000),
+    }
+
+    async def operation(i: int):
+        await middleware(scope, None, None)
+
+    return operation
+
+
+# -- order service ------------------------------------------------------------
+
+
+def item_names(count: int) -> list:
+    from catalog import catalog
+
+    names = list(catalog.categories)
+    names += [f"Item {i}" for i in range(max(0, count - len(names)))]
+    return names[:count]
+
+
+def write_seed_batch(db, headers, items, legacy: bool):
+    from models import Order, OrderHeader, OrderItem
+    from rollups import apply_rollups
+    from search import index_orders, search_row
+
+    by_id = {header["id"]: header for header in headers}
+    rows = [
+        dict(
+            by_id[item["order_id"]],
+            id=item["id"],
+            item_type=item["item_type"],
+            quantity=item["quantity"],
+        )
+        for item in items
+    ]
+    if legacy:
+        db.execute(insert(Order), rows)
+    else:
+        db.execute(insert(OrderHeader), headers)
+        db.execute(insert(OrderItem), items)
+        by_order = {header["id"]: [] for header in headers}
+        for item in items:
+            by_order[item["order_id"]].append(item)
+        index_orders(db, [search_row(h, by_order[h["id"]]) for h in headers])
+    apply_rollups(db, rows)
+    db.commit()
+
+
+def seed_orders(ctx: Context, legacy: bool = False, houses: bool = False):
+    # Users, vendors (one service area each, at "<i> Market Road") and
+    # orders of 1-5 items spread over them, with rollups, geocodes and search
+    # documents to match. legacy=True writes the old one-row-per-item orders
+    # table; houses=True prefixes pickup addresses with "House <n>, Sector
+    # <m>, " (1-500, 1-60) so they differ within an area.
+    from areas import address_key, resolve_area_id
+    from database import SessionLocal
+    from identity import SECRET_KEY
+    from models import Geocode
+
+    rng = ctx.rng
+    users = ctx.scale["users"]
+    vendors = max(1, ctx.scale["vendors"])
+    orders = ctx.scale["orders"]
+    names = item_names(30)
+    addresses = [f"{i} Market Road" for i in range(vendors)]
+    user_ids = [uuid4() for _ in range(users)]
+    vendor_ids = [uuid4() for _ in range(vendors)]
+    now = datetime.utcnow().replace(microsecond=0)
+
+    with SessionLocal() as db:
+        area_ids = [resolve_area_id(db, address) for address in addresses]
+        db.execute(
+            insert(Geocode),
+            [
+                {
+                    "key": address_key(address),
+                    "latitude": 28.5 + rng.random() * 0.2,
+                    "longitude": 77.0 + rng.random() * 0.2,
+                }
+                for address in addresses
+            ],
+        )
+        db.commit()
+        headers, items = [], []
+        for k in range(orders):
+            area = k % vendors
+            user = k % users
+            header = {
+                "id": uuid4().bytes,
+                "user_id": user_ids[user].bytes,
+                "user_name": f"user{user}",
+                "pickup_date": now + timedelta(days=rng.randint(0, 6)),
+                "order_date": now - timedelta(seconds=orders - k),
+                "pickup_address": addresses[area],
+                "service_area_id": area_ids[area],
+            }
+            if houses:
+                header["pickup_address"] = (
+                    f"House {rng.randint(1, 500)}, Sector {rng.randint(1, 60)}, "
+                    f"{addresses[area]}"
+                )
+            headers.append(header)
+            for name in rng.sample(names, rng.randint(1, 5)):
+                items.append(
+                    {
+                        "id": uuid4().bytes,
+                        "order_id": header["id"],
+                        "item_type": name,
+                        "quantity": float(rng.randint(1, 20)),
+                    }
+                )
+            if len(items) >= 5000:
+                write_seed_batch(db, headers, items, legacy)
+                headers, items = [], []
+        if headers:
+            write_seed_batch(db, headers, items, legacy)
+
+    ctx.user_headers = [
+        bearer(
+            token(
+                SECRET_KEY,
+                {"sub": f"user{i}", "user_id": str(uid), "kind": "user"},
+            )
+        )
+        for i, uid in enumerate(user_ids[:1000])
+    ]
+    ctx.vendor_headers = [
+        bearer(
+            token(
+                SECRET_KEY,
+                {
+                    "sub": f"vendor{i}@example.com",
+                    "user_id": str(vid),
+                    "address": addresses[i],
+                    "kind": "vendor",
+                },
+            )
+        )
+        for i, vid in enumerate(vendor_ids[:1000])
+    ]
+    ctx.addresses = addresses
+    ctx.area_ids = area_ids
+    ctx.user_ids = [str(uid) for uid in user_ids[:1000]]
+
+
+def order_body(ctx: Context, i: int, items: int) -> dict:
+    names = item_names(items)
+    return {
+        "items": {name: float(1 + (i + n) % 9) for n, name in enumerate(names)},
+        "pickup_date": (datetime.utcnow() + timedelta(days=1)).isoformat(),
+        "pickup_address": ctx.addresses[i % len(ctx.addresses)],
+    }
+
+
+@scenario("order", "create_order")
+def order_create(ctx: Context):
+    """POST /order with `items` line items (default 3)."""
+    seed_orders(ctx)
+    items = ctx.param("items", 3)
+
+    def request(i: int):
+        headers = ctx.user_headers[i % len(ctx.user_headers)]
+        return "POST", "/order", {"json": order_body(ctx, i, items), "headers": headers}
+
+    return request
+
+
+@scenario("order", "vendor_orders")
+def order_vendor_orders(ctx: Context):
+    """GET /vendor/order, first page of `limit` rows (default 100)."""
+    seed_orders(ctx)
+    limit = ctx.param("limit", 100)
+
+    def request(i: int):
+        headers = ctx.vendor_headers[i % len(ctx.vendor_headers)]
+        return "GET", f"/vendor/order?limit={limit}", {"headers": headers}
+
+    return request
+
+
+@scenario("order", "user_orders")
+def order_user_orders(ctx: Context):
+    """GET /orders, first page of `limit` rows (default 100)."""
+    seed_orders(ctx)
+    limit = ctx.param("limit", 100)
+
+    def request(i: int):
+        headers = ctx.user_headers[i % len(ctx.user_headers)]
+        return "GET", f"/orders?limit={limit}", {"headers": headers}
+
+    return request
+
+
+@scenario("order", "vendor_summary")
+def order_vendor_summary(ctx: Context):
+    """GET /vendor/order/summary from the rollups."""
+    seed_orders(ctx)
+
+    def request(i: int):
+        headers = ctx.vendor_headers[i % len(ctx.vendor_headers)]
+        return "GET", "/vendor/order/summary", {"headers": headers}
+
+    return request
+
+
+@scenario("order", "catalog")
+def order_catalog(ctx: Context):
+    """GET /items as a browser would fetch it (br/gzip)."""
+
+    def request(i: int):
+        return "GET", "/items", {"headers": {"Accept-Encoding": "gzip, br"}}
+
+    return request
+
+
+@scenario("order", "invoice_download")
+def order_invoice_download(ctx: Context):
+    """GET /order/{id}/invoice for already rendered invoices."""
+    seed_orders(ctx)
+    from invoices import invoice_queue
+
+    invoice_ids = []
+    for i in range(20):
+        invoice_ids.append(
+            invoice_queue.enqueue(
+                ctx.user_ids[0],
+                {
+                    "user": f"user{i}",
+                    "pickup_address": ctx.addresses[0],
+                    "pickup_date": datetime.utcnow().isoformat(),
+                    "items": [{"item_type": "Newspapers", "quantity": float(i + 1)}],
+                },
+            )
+        )
+    deadline = time.monotonic() + 60
+    while any(invoice_queue.get(i)["status"] != "ready" for i in invoice_ids):
+        if time.monotonic() > deadline:
+            raise RuntimeError("invoices were not rendered within 60s")
+        time.sleep(0.1)
+
+    def request(i: int):
+        headers = ctx.user_headers[0]
+        return "GET", f"/order/{invoice_ids[i % 20]}/invoice", {"headers": headers}
+
+    return request
+
+
+@scenario("order", "mix")
+def order_mix(ctx: Context):
+    """Weighted mix: 40% catalog, 20% each listing, 10% create, 10% summary."""
+    seed_orders(ctx)
+    choices = ["catalog"] * 4 + ["vendor"] * 2 + ["user"] * 2 + ["create"] + ["summary"]
+    plan = [ctx.rng.choice(choices) for _ in range(1024)]
+
+    def request(i: int):
+        kind = plan[i % len(plan)]
+        users = ctx.user_headers[i % len(ctx.user_headers)]
+        vendors = ctx.vendor_headers[i % len(ctx.vendor_headers)]
+        if kind == "catalog":
+            return "GET", "/items", {"headers": {"Accept-Encoding": "gzip, br"}}
+        if kind == "vendor":
+            return "GET", "/vendor/order?limit=100", {"headers": vendors}
+        if kind == "user":
+            return "GET", "/orders?limit=100", {"headers": users}
+        if kind == "summary":
+            return "GET", "/vendor/order/summary", {"headers": vendors}
+        return "POST", "/order", {"json": order_body(ctx, i, 3), "headers": users}
+
+    return request
+
+
+def synthetic_order_rows(rng: random.Random, count: int):
+    # Listing header tuples and their items, three per order
+    now = datetime.utcnow()
+    rows, items = [], {}
+    for i in range(count):
+        order_id = uuid4().bytes
+        rows.append(
+            (
+                order_id,
+                now + timedelta(days=rng.randint(0, 6)),
+                now - timedelta(seconds=i),
+                f"user{i % 1000}",
+                f"{i % 50} Market Road",
+                "placed",
+            )
+        )
+        items[order_id] = [
+            (uuid4().bytes, name, float(rng.randint(1, 20)))
+            for name in ("Newspapers", "Copper wires", "Cardboard")
+        ]
+    return rows, items
+
+
+def peak_memory_mb(operation) -> float:
+    tracemalloc.start()
+    try:
+        operation()
+        return round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+    finally:
+        tracemalloc.stop()
+
+
+@scenario("order", "listing", kind="micro")
+def order_listing(ctx: Context):
+    """Serialize `rows` orders (default 10000) for a listing response.
+
+    path=columns is the current tuple + orjson path; path=orm rebuilds the
+    previous ORM entity + jsonable_encoder + json path for comparison.
+    """
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    from listing import item_dict, page_response
+    from models import OrderHeader, OrderItem
+
+    rows, raw_items = synthetic_order_rows(ctx.rng, ctx.param("rows", 10000))
+    columns = (
+        "id",
+        "pickup_date",
+        "order_date",
+        "user_name",
+        "pickup_address",
+        "status",
+    )
+
+    if ctx.params.get("path", "columns") == "orm":
+        from uuid import UUID
+
+        entities = [
+            (
+                OrderHeader(**dict(zip(columns, row))),
+                [
+                    OrderItem(id=item_id, item_type=item_type, quantity=quantity)
+                    for item_id, item_type, quantity in raw_items[row[0]]
+                ],
+            )
+            for row in rows
+        ]
+
+        def serialize():
+            orders = [
+                {
+                    "order_id": str(UUID(bytes=o.id)),
+                    "pickup_date": o.pickup_date,
+                    "order_date": o.order_date,
+                    "user_name": o.user_name,
+                    "pickup_address": o.pickup_address,
+                    "status": o.status,
+                    "items": [
+                        {
+                            "item_id": str(UUID(bytes=item.id)),
+                            "item_type": item.item_type,
+                            "quantity": item.quantity,
+                        }
+                        for item in order_items
+                    ],
+                }
+                for o, order_items in entities
+            ]
+            body = {"status": "success", "orders": orders, "next_cursor": None}
+            return JSONResponse(jsonable_encoder(body)).body
+
+    else:
+
+        def serialize():
+            items = {
+                order_id: [item_dict(*item) for item in order_items]
+                for order_id, order_items in raw_items.items()
+            }
+            return page_response(rows, items, None).body
+
+    ctx.extra["rows"] = len(rows)
+    ctx.extra["peak_memory_mb"] = peak_memory_mb(serialize)
+    ctx.extra["response_bytes"] = len(serialize())
+
+    def operation(i: int):
+        serialize()
+
+    return operation
+
+
+@scenario("order", "schema", kind="micro")
+def order_schema(ctx: Context):
+    """Read one vendor's newest `limit` orders (default 100) per layout.
+
+    layout=legacy seeds the old one-row-per-item orders table and reads
+    limit x 3 rows (as many items, on average). layout=headers seeds the same
+    orders into the legacy table, copies them with backfill.py (timed), then
+    reads `limit` headers plus their items in one batched query. Both report
+    the bytes of data and indexes of the tables they read.
+    """
+    from sqlalchemy import select
+
+    from backfill import backfill_orders, table_sizes
+    from database import SessionLocal
+    from listing import load_items, rows_to_dicts, select_orders, uuid_str
+    from models import Order, OrderHeader
+
+    seed_orders(ctx, legacy=True)
+    limit = ctx.param("limit", 100)
+    layout = ctx.params.get("layout", "headers")
+    db = SessionLocal()
+
+    if layout == "legacy":
+        tables = ["orders"]
+        legacy_fields = (
+            "item_type",
+            "quantity",
+            "pickup_date",
+            "order_date",
+            "user_name",
+            "pickup_address",
+            "status",
+        )
+        legacy_columns = (
+            Order.id,
+            Order.item_type,
+            Order.quantity,
+            Order.pickup_date,
+            Order.order_date,
+            Order.user_name,
+            Order.pickup_address,
+            Order.status,
+        )
+
+        def read(area_id):
+            rows = db.execute(
+                select(*legacy_columns)
+                .where(Order.service_area_id == area_id)
+                .order_by(Order.order_date.desc(), Order.id.desc())
+                .limit(limit * 3)
+            ).all()
+            # Shaped as the per-item listing used to return them
+            return [
+                {
+                    "order_id": uuid_str(row[0]),
+                    **dict(zip(legacy_fields, row[1:])),
+                }
+                for row in rows
+            ]
+
+    else:
+        tables = ["order_headers", "order_items"]
+        start = time.perf_counter()
+        ctx.extra["backfilled_rows"] = backfill_orders(db)
+        ctx.extra["backfill_seconds"] = round(time.perf_counter() - start, 2)
+
+        def read(area_id):
+            rows = db.execute(
+                select_orders()
+                .where(OrderHeader.service_area_id == area_id)
+                .order_by(OrderHeader.order_date.desc(), OrderHeader.id.desc())
+                .limit(limit)
+            ).all()
+            return rows_to_dicts(rows, load_items(db, [row.id for row in rows]))
+
+    sizes = table_sizes(db, tables)
+    ctx.extra["data_bytes"] = sum(size["data"] for size in sizes.values())
+    ctx.extra["index_bytes"] = sum(size["index"] for size in sizes.values())
+
+    def operation(i: int):
+        read(ctx.area_ids[i % len(ctx.area_ids)])
+
+    return operation
+
+
+@scenario("order", "search", kind="micro")
+def order_search(ctx: Context):
+    """Search one vendor's area for `q` (default "copper"), first 20 ids.
+
+    engine=index reads the full-text index (FTS5 on SQLite, FULLTEXT ngram
+    on MySQL) as GET /vendor/order/search does; engine=like scans the area's
+    documents with LIKE '%term%' per term, newest first. Pickup addresses
+    vary per order ("House 12, Sector 14, 3 Market Road"). Reports the
+    matches in the first area and the size of the search tables.
+    """
+    from sqlalchemy import func, select
+
+    from backfill import table_sizes
+    from database import SessionLocal
+    from models import OrderSearch
+    from search import query_terms, search_order_ids
+
+    seed_orders(ctx, houses=True)
+    q = ctx.params.get("q", "copper")
+    engine = ctx.params.get("engine", "index")
+    db = SessionLocal()
+
+    if engine == "like":
+
+        def read(area_id):
+            stmt = select(OrderSearch.order_id).where(
+                OrderSearch.service_area_id == area_id
+            )
+            for term in query_terms(q):
+                stmt = stmt.where(OrderSearch.document.like(f"%{term}%"))
+            stmt = stmt.order_by(OrderSearch.order_date.desc(), OrderSearch.id.desc())
+            return db.scalars(stmt.limit(20)).all()
+
+    else:
+
+        def read(area_id):
+            return search_order_ids(db, [area_id], q, 20)
+
+    ids, _ = search_order_ids(db, [ctx.area_ids[0]], q, 10**9)
+    ctx.extra["matches"] = len(ids)
+    ctx.extra["area_documents"] = db.scalar(
+        select(func.count()).where(OrderSearch.service_area_id == ctx.area_ids[0])
+    )
+    tables = ["order_search"]
+    if db.get_bind().dialect.name == "sqlite":
+        tables += ["order_search_fts_data", "order_search_fts_idx"]
+    sizes = table_sizes(db, tables)
+    ctx.extra["data_bytes"] = sizes["order_search"]["data"]
+    ctx.extra["index_bytes"] = (
+        sum(size["data"] + size["index"] for size in sizes.values())
+        - ctx.extra["data_bytes"]
+    )
+
+    def operation(i: int):
+        read(ctx.area_ids[i % len(ctx.area_ids)])
+
+    return operation
+
+
+@scenario("order", "invoice_render", kind="micro")
+def order_invoice_render(ctx: Context):
+    """Render one invoice of `items` lines (default 10).
+
+    path=memory is the current in-memory render; path=tempfile adds the
+    previous temp-file round trip and base64 JSON body around it.
+    """
+    from invoices import render_invoice
+
+    invoice = {
+        "user": "user0",
+        "pickup_address": "0 Market Road",
+        "pickup_date": datetime.utcnow().isoformat(),
+        "generated_on": datetime.utcnow().isoformat(),
+        "items": [
+            {"item_type": name, "quantity": 2.0}
+            for name in item_names(ctx.param("items", 10))
+        ],
+    }
+
+    if ctx.params.get("path", "memory") == "tempfile":
+
+        def render():
+            pdf = render_invoice(invoice)
+            with tempfile.NamedTemporaryFile(suffix=".pdf") as f:
+                f.write(pdf)
+                f.flush()
+                with open(f.name, "rb") as saved:
+                    pdf = saved.read()
+            encoded = base64.b64encode(pdf).decode("ascii")
+            return json.dumps({"status": "success", "invoice": encoded}).encode()
+
+    else:
+        render = lambda: render_invoice(invoice)  # noqa: E731
+
+    ctx.extra["bytes_sent"] = len(render())
+    ctx.extra["peak_memory_mb"] = peak_memory_mb(render)
+    cpu = [0.0]
+
+    def operation(i: int):
+        start = time.process_time()
+        render()
+        cpu[0] += time.process_time() - start
+        ctx.extra["cpu_ms_per_op"] = round(cpu[0] * 1000 / (i + 1), 3)
+
+    return operation
+
+
+@scenario("order", "route", kind="micro")
+def order_route(ctx: Context):
+    """Plan a route over `stops` random pickups (default 1000).
+
+    params: cluster=auto|on|off (auto clusters from ROUTE_CLUSTER_MIN_STOPS).
+    Reports the distance of the plain nearest-neighbor route for comparison.
+    """
+    import numpy as np
+
+    import routes
+    from routes import nearest_neighbor, path_length, plan_stops, project
+
+    generator = np.random.default_rng(ctx.rng.randrange(2**32))
+    stops = ctx.param("stops", 1000)
+    latlon = np.column_stack(
+        (28.4 + generator.random(stops) * 0.3, 77.0 + generator.random(stops) * 0.3)
+    )
+    origin_latlon = (28.55, 77.15)
+    cluster = ctx.params.get("cluster", "auto")
+    if cluster != "auto":
+        routes.ROUTE_CLUSTER_MIN_STOPS = 0 if cluster == "on" else stops + 1
+
+    lat0 = float(latlon[:, 0].mean())
+    points = project(latlon, lat0)
+    origin = project(np.array([origin_latlon]), lat0)[0]
+    nn_distance = path_length(points[nearest_neighbor(points, origin)], origin)
+    ctx.extra["nn_distance_km"] = round(nn_distance, 1)
+
+    def operation(i: int):
+        legs, distance = plan_stops(latlon, origin_latlon)
+        ctx.extra["distance_km"] = round(distance, 1)
+        ctx.extra["vs_nn"] = round(distance / nn_distance, 3)
+        ctx.extra["legs"] = len(legs)
+
+    return operation
+
+
+class StubAuthServer:
+    # The auth service's /me endpoints on a local port, answering after
+    # `delay` seconds with `status`. Runs uvicorn in a thread of its own.
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.status = 200
+        self.calls = 0
+        self.server = None
+
+    async def __call__(self, scope, receive, send):
+        import asyncio
+
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        body = json.dumps({"user_id": str(uuid4()), "address": "0 Market Road"})
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        await send({"type": "http.response.body", "body": body.encode()})
+
+    def start(self) -> str:
+        import socket
+        import threading
+
+        import uvicorn
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        config = uvicorn.Config(
+            self, host="127.0.0.1", port=port, lifespan="off", log_level="warning"
+        )
+        self.server = uvicorn.Server(config)
+        threading.Thread(target=self.server.run, daemon=True).start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("stub auth server did not start within 10s")
+            time.sleep(0.01)
+        return f"http://127.0.0.1:{port}"
+
+
+@scenario("order", "auth_lookup", kind="micro")
+def order_auth_lookup(ctx: Context):
+    """A burst of `fanout` (default 20) concurrent /vendor/me lookups of one
+    token against a stub auth server answering in `upstream_ms` (5).
+
+    coalesce=on|off shares one in-flight request per token or sends one per
+    caller; breaker=open fails every lookup fast with the breaker tripped;
+    pool=off opens a client per lookup, as before the shared AuthClient.
+    """
+    import asyncio
+
+    import httpx
+    from fastapi import HTTPException
+
+    from identity import ME_PATHS, AuthClient, CircuitBreaker
+
+    fanout = ctx.param("fanout", 20)
+    stub = StubAuthServer(ctx.param("upstream_ms", 5.0) / 1000)
+    base_url = stub.start()
+    client = AuthClient(base_url, CircuitBreaker(1, reset_timeout=3600))
+    coalesce = ctx.params.get("coalesce", "on") == "on"
+    pooled = ctx.params.get("pool", "on") == "on"
+    if ctx.params.get("breaker", "closed") == "open":
+        stub.status = 500
+
+    async def unpooled(token: str):
+        async with httpx.AsyncClient(base_url=base_url) as once:
+            response = await once.get(
+                ME_PATHS["vendor"], headers={"Authorization": f"Bearer {token}"}
+            )
+        if response.status_code != 200:
+            raise HTTPException(status_code=503, detail="Auth service unavailable")
+        return response.json()
+
+    def lookup(token: str):
+        if not pooled:
+            return unpooled(token)
+        if coalesce:
+            return client.fetch_identity(token, "vendor")
+        return client._fetch(token, "vendor")
+
+    async def operation(i: int):
+        if pooled and stub.status != 200 and client.breaker.state == "closed":
+            # Trip the breaker once; every later lookup is refused locally
+            await asyncio.gather(lookup("trip"), return_exceptions=True)
+        calls = stub.calls
+        results = await asyncio.gather(
+            *(lookup(f"token-{i}") for _ in range(fanout)), return_exceptions=True
+        )
+        ctx.extra["lookups_per_op"] = fanout
+        ctx.extra["upstream_calls_per_op"] = stub.calls - calls
+        ctx.extra["failed_per_op"] = sum(isinstance(r, Exception) for r in results)
+        ctx.extra["breaker"] = client.breaker.state
+
+    return operation
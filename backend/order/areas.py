@@ -0,0 +1,139 @@
+import argparse
+import os
+import re
+import threading
+from uuid import UUID
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import ServiceArea, VendorServiceArea
+
+# Without a PIN code, an address's area is its last this many comma-separated
+# parts: "House 9, Lane 3, Sector 14, Gurgaon" is in "sector 14 gurgaon"
+AREA_KEY_PARTS = int(os.getenv("AREA_KEY_PARTS", "2"))
+
+PIN_CODE = re.compile(r"(?<!\d)(\d{3})\s?(\d{3})(?!\d)")
+
+# Area keys never change once created, so their ids are cached per process
+_area_ids = {}
+_area_ids_lock = threading.Lock()
+
+
+def address_key(address: str) -> str:
+    # "Sector 14,  Gurgaon" and "sector 14 gurgaon" are the same address
+    return " ".join(re.sub(r"[^\w\s]", " ", address.lower()).split())
+
+
+def area_key(address: str) -> str:
+    # The postal PIN code when the address has one, else its locality
+    pin = PIN_CODE.search(address)
+    if pin:
+        return "".join(pin.groups())
+    parts = [part for part in map(address_key, address.split(",")) if part]
+    return " ".join(parts[-AREA_KEY_PARTS:])
+
+
+def find_area_id(db: Session, address: str):
+    key = area_key(address)
+    area_id = _area_ids.get(key)
+    if area_id is None:
+        area_id = db.execute(
+            select(ServiceArea.id).where(ServiceArea.key == key)
+        ).scalar()
+        if area_id is not None:
+            with _area_ids_lock:
+                _area_ids[key] = area_id
+    return area_id
+
+
+def resolve_area_id(db: Session, address: str) -> int:
+    # Get-or-create; commits on its own so call it before any other writes
+    area_id = find_area_id(db, address)
+    if area_id is not None:
+        return area_id
+    try:
+        db.execute(insert(ServiceArea).values(key=area_key(address), name=address))
+        db.commit()
+    except IntegrityError:
+        # Another request created it first
+        db.rollback()
+    return find_area_id(db, address)
+
+
+def vendor_area_ids(db: Session, vendor_id: bytes, address: str | None):
+    area_ids = (
+        db.execute(
+            select(VendorServiceArea.service_area_id).where(
+                VendorServiceArea.vendor_id == vendor_id
+            )
+        )
+        .scalars()
+        .all()
+    )
+    if area_ids:
+        return list(area_ids)
+
+    # Vendors without an explicit mapping serve the area of their address
+    area_id = find_area_id(db, address) if address else None
+    return [area_id] if area_id is not None else []
+
+
+def assign_areas(db: Session, vendor_id: bytes, addresses, replace: bool = False):
+    # Maps a vendor to the areas of `addresses` (an address, locality or PIN
+    # code each), creating areas no order has used yet. Returns the
+    # vendor's area ids afterwards.
+    area_ids = {resolve_area_id(db, address) for address in addresses}
+    current = set(vendor_area_ids(db, vendor_id, None))
+    if replace:
+        db.execute(
+            delete(VendorServiceArea).where(
+                VendorServiceArea.vendor_id == vendor_id,
+                VendorServiceArea.service_area_id.not_in(area_ids),
+            )
+        )
+        current &= area_ids
+    missing = sorted(area_ids - current)
+    if missing:
+        db.execute(
+            insert(VendorServiceArea),
+            [{"vendor_id": vendor_id, "service_area_id": i} for i in missing],
+        )
+    db.commit()
+    return sorted(current | area_ids)
+
+
+def area_names(db: Session, area_ids) -> list:
+    return db.execute(
+        select(ServiceArea.id, ServiceArea.key, ServiceArea.name)
+        .where(ServiceArea.id.in_(area_ids))
+        .order_by(ServiceArea.id)
+    ).all()
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Manage vendor service areas")
+    parser.add_argument("command", choices=["assign", "show"])
+    parser.add_argument("vendor_id", type=UUID)
+    parser.add_argument(
+        "areas", nargs="*", help="addresses, localities or PIN codes to assign"
+    )
+    parser.add_argument(
+        "--replace", action="store_true", help="drop the vendor's other areas"
+    )
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        if args.command == "assign":
+            if not args.areas:
+                parser.error("assign needs at least one area")
+            area_ids = assign_areas(
+                session, args.vendor_id.bytes, args.areas, args.replace
+            )
+        else:
+            area_ids = vendor_area_ids(session, args.vendor_id.bytes, None)
+        for area_id, key, name in area_names(session, area_ids):
+            print(f"{area_id}\t{key}\t{name}")
@@ -0,0 +1,177 @@
+import argparse
+import time
+
+from sqlalchemy import and_, bindparam, or_, select, text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from lifecycle import STATUSES
+from models import Order, OrderHeader, OrderItem
+
+LEGACY_COLUMNS = (
+    Order.id,
+    Order.user_id,
+    Order.user_name,
+    Order.item_type,
+    Order.quantity,
+    Order.pickup_date,
+    Order.order_date,
+    Order.pickup_address,
+    Order.service_area_id,
+    Order.status,
+    Order.vendor_id,
+)
+HEADER_FIELDS = (
+    "user_id",
+    "user_name",
+    "pickup_date",
+    "order_date",
+    "pickup_address",
+    "service_area_id",
+)
+
+
+def insert_ignore(dialect: str, model):
+    # Rows already copied by an earlier (interrupted) run are skipped
+    if dialect == "mysql":
+        return mysql_insert(model).prefix_with("IGNORE")
+    return sqlite_insert(model).on_conflict_do_nothing()
+
+
+def legacy_chunk(db: Session, after, batch_size: int) -> list:
+    # Legacy rows in (user_id, order_date, id) order, the order of the
+    # (user_id, order_date) index. Plain SELECTs take no locks on InnoDB.
+    stmt = select(*LEGACY_COLUMNS)
+    if after is not None:
+        user_id, order_date, order_id = after
+        stmt = stmt.where(
+            or_(
+                Order.user_id > user_id,
+                and_(
+                    Order.user_id == user_id,
+                    or_(
+                        Order.order_date > order_date,
+                        and_(Order.order_date == order_date, Order.id > order_id),
+                    ),
+                ),
+            )
+        )
+    rows = db.execute(
+        stmt.order_by(Order.user_id, Order.order_date, Order.id).limit(batch_size)
+    ).all()
+    if len(rows) == batch_size:
+        # Take the rest of the last request's items too, so no order is split
+        # across chunks
+        last = rows[-1]
+        rows += db.execute(
+            select(*LEGACY_COLUMNS)
+            .where(
+                Order.user_id == last.user_id,
+                Order.order_date == last.order_date,
+                Order.id > last.id,
+            )
+            .order_by(Order.id)
+        ).all()
+    return rows
+
+
+def group_orders(rows):
+    # Items written by one POST /order share the user and order_date. The
+    # header takes the id of its first item, so re-runs produce the same ids.
+    headers, items = {}, []
+    for row in rows:
+        key = (row.user_id, row.order_date, row.pickup_address, row.pickup_date)
+        header = headers.get(key)
+        if header is None:
+            header = headers[key] = {
+                "id": row.id,
+                "status": row.status,
+                "vendor_id": row.vendor_id,
+                **{field: getattr(row, field) for field in HEADER_FIELDS},
+            }
+        elif STATUSES.index(row.status) < STATUSES.index(header["status"]):
+            # Items moved separately; the order is as far along as its
+            # least advanced item
+            header["status"] = row.status
+        header["vendor_id"] = header["vendor_id"] or row.vendor_id
+        items.append(
+            {
+                "id": row.id,
+                "order_id": header["id"],
+                "item_type": row.item_type,
+                "quantity": row.quantity,
+            }
+        )
+    return list(headers.values()), items
+
+
+def backfill_orders(db: Session, batch_size: int = 2000, pause: float = 0.0):
+    # Copies legacy orders rows into order_headers/order_items, one commit per
+    # chunk. Safe to re-run and to interrupt; run it again once no worker
+    # writes the orders table any more to pick up stragglers.
+    dialect = db.get_bind().dialect.name
+    after = None
+    copied = 0
+    while True:
+        rows = legacy_chunk(db, after, batch_size)
+        if not rows:
+            break
+        headers, items = group_orders(rows)
+        db.execute(insert_ignore(dialect, OrderHeader), headers)
+        db.execute(insert_ignore(dialect, OrderItem), items)
+        db.commit()
+        copied += len(rows)
+        last = rows[-1]
+        after = (last.user_id, last.order_date, last.id)
+        if pause:
+            # Leaves room for replicas and foreground writes to keep up
+            time.sleep(pause)
+    return copied
+
+
+def table_sizes(db: Session, tables) -> dict:
+    # Bytes of row data and of indexes per table. MySQL's figures are the
+    # optimizer's estimates; run ANALYZE TABLE first for fresh ones.
+    if db.get_bind().dialect.name == "mysql":
+        rows = db.execute(
+            text(
+                "SELECT table_name, data_length, index_length "
+                "FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name IN :tables"
+            ).bindparams(bindparam("tables", list(tables), expanding=True))
+        )
+        return {name: {"data": data, "index": index} for name, data, index in rows}
+    sizes = {table: {"data": 0, "index": 0} for table in tables}
+    rows = db.execute(
+        text(
+            "SELECT m.tbl_name, m.type, SUM(s.pgsize) FROM dbstat s "
+            "JOIN sqlite_master m ON m.name = s.name GROUP BY m.tbl_name, m.type"
+        )
+    )
+    for table, kind, size in rows:
+        if table in sizes:
+            sizes[table]["data" if kind == "table" else "index"] += size
+    return sizes
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(
+        description="Copy legacy orders rows into order_headers/order_items"
+    )
+    parser.add_argument("command", choices=["orders", "sizes"])
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument(
+        "--pause", type=float, default=0.0, help="seconds to sleep between chunks"
+    )
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        if args.command == "orders":
+            count = backfill_orders(session, args.batch_size, args.pause)
+            print(f"Copied {count} legacy order rows")
+        sizes = table_sizes(session, ["orders", "order_headers", "order_items"])
+        for table, size in sizes.items():
+            print(f"{table:15} data {size['data']:>12,}  index {size['index']:>12,}")
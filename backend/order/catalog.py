@@ -0,0 +1,108 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+CATALOG_PATH = os.getenv(
+    "CATALOG_PATH", os.path.join(os.path.dirname(__file__), "catalog.json")
+)
+# How often the data file is checked for edits
+CATALOG_RELOAD_INTERVAL = float(os.getenv("CATALOG_RELOAD_INTERVAL", "5"))
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "300"))
+
+
+class CatalogVariant:
+    __slots__ = ("body", "etag", "headers")
+
+    def __init__(self, body: bytes, etag: str, encoding: str | None):
+        self.body = body
+        self.etag = etag
+        self.headers = {
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={CATALOG_MAX_AGE}",
+            "Vary": "Accept-Encoding",
+        }
+        if encoding:
+            self.headers["Content-Encoding"] = encoding
+
+
+class Catalog:
+    # The scrap catalog, serialized and compressed once per edit of the data
+    # file so GET /items only picks a prebuilt variant
+    def __init__(self, path: str):
+        self.path = path
+        self.variants = {}
+        self.categories = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path, "rb") as f:
+            data = json.load(f)
+        if not isinstance(data.get("scrap_items"), list):
+            raise ValueError(f"{self.path}: 'scrap_items' must be a list")
+
+        body = json.dumps(
+            {"status": "success", "data": data},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        variants = {
+            "identity": CatalogVariant(body, f'"{digest}"', None),
+            "gzip": CatalogVariant(
+                gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gz"', "gzip"
+            ),
+        }
+        if brotli is not None:
+            variants["br"] = CatalogVariant(
+                brotli.compress(body, quality=11), f'"{digest}-br"', "br"
+            )
+        # Swap in one assignment so readers never see a half-built catalog
+        self.variants = variants
+        self.categories = {
+            item: group["category"]
+            for group in data["scrap_items"]
+            for item in group["items"]
+        }
+        self._mtime = mtime
+
+    def refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < CATALOG_RELOAD_INTERVAL:
+            return
+        with self._lock:
+            if now - self._checked_at < CATALOG_RELOAD_INTERVAL:
+                return
+            self._checked_at = now
+            try:
+                if os.stat(self.path).st_mtime_ns != self._mtime:
+                    self.load()
+            except (OSError, ValueError):
+                # Keep serving the last good catalog if an edit is broken
+                if not self.variants:
+                    raise
+
+    def category_of(self, item_type: str) -> str:
+        return self.categories.get(item_type, "Other")
+
+    def variant(self, accept_encoding: str) -> CatalogVariant:
+        self.refresh()
+        variants = self.variants
+        if "br" in accept_encoding and "br" in variants:
+            return variants["br"]
+        if "gzip" in accept_encoding:
+            return variants["gzip"]
+        return variants["identity"]
+
+
+catalog = Catalog(CATALOG_PATH)
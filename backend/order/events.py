@@ -0,0 +1,214 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import orjson
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal
+from listing import uuid_str
+from models import OrderEvent
+
+# Rows per outbox read, for the shared poller and for catch-up reads
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", "500"))
+EVENT_POLL_INTERVAL = float(os.getenv("EVENT_POLL_INTERVAL", "1.0"))
+# Recent events each worker keeps in memory for its waiting consumers
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "10000"))
+EVENT_MAX_WAIT = float(os.getenv("EVENT_MAX_WAIT", "25"))
+# Outbox ids are allocated at insert but become visible at commit, so an
+# event is only served once it is this old; otherwise a lower id committing
+# later could fall behind a consumer's cursor
+EVENT_SETTLE_MS = float(os.getenv("EVENT_SETTLE_MS", "1000"))
+EVENT_RETENTION = int(os.getenv("EVENT_RETENTION", str(7 * 24 * 3600)))
+# Comment lines sent on an idle SSE stream so proxies keep it open
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+
+
+def order_snapshot(header, items, status: str) -> str:
+    # Same shape as a listing entry
+    return orjson.dumps(
+        {
+            "order_id": uuid_str(header["id"]),
+            "pickup_date": header["pickup_date"],
+            "order_date": header["order_date"],
+            "user_name": header["user_name"],
+            "pickup_address": header["pickup_address"],
+            "status": status,
+            "items": items,
+        }
+    ).decode("utf-8")
+
+
+def record_events(db: Session, headers, items: dict, status: str, vendor_id=None):
+    # Runs inside the caller's transaction, one event per order. `items` maps
+    # order ids to their listing item dicts.
+    if not headers:
+        return
+    now = datetime.utcnow()
+    db.execute(
+        insert(OrderEvent),
+        [
+            {
+                "order_id": header["id"],
+                "service_area_id": header["service_area_id"],
+                "event_type": status,
+                "vendor_id": vendor_id,
+                "payload": order_snapshot(header, items[header["id"]], status),
+                "created_at": now,
+            }
+            for header in headers
+        ],
+    )
+
+
+def settled_events(after: int, limit: int, area_ids=None):
+    settled = datetime.utcnow() - timedelta(milliseconds=EVENT_SETTLE_MS)
+    stmt = select(
+        OrderEvent.id,
+        OrderEvent.service_area_id,
+        OrderEvent.event_type,
+        OrderEvent.payload,
+    ).where(OrderEvent.id > after, OrderEvent.created_at <= settled)
+    if area_ids is not None:
+        stmt = stmt.where(OrderEvent.service_area_id.in_(area_ids))
+    db = SessionLocal()
+    try:
+        return db.execute(stmt.order_by(OrderEvent.id).limit(limit)).all()
+    finally:
+        db.close()
+
+
+def latest_event_id() -> int:
+    with SessionLocal() as db:
+        return db.execute(select(func.max(OrderEvent.id))).scalar() or 0
+
+
+def purge_expired(db: Session):
+    cutoff = datetime.utcnow() - timedelta(seconds=EVENT_RETENTION)
+    db.execute(delete(OrderEvent).where(OrderEvent.created_at < cutoff))
+    db.commit()
+
+
+def to_event(row) -> dict:
+    return {
+        "id": str(row.id),
+        "type": row.event_type,
+        "order": orjson.loads(row.payload),
+    }
+
+
+class EventFeed:
+    # One poller per worker reads the outbox tail for every area; waiting
+    # consumers filter that shared tail instead of each querying the table
+    def __init__(self, interval: float, size: int):
+        self.interval = interval
+        self.size = size
+        self.events = []
+        # Every event with floor < id <= last_id is in self.events
+        self.floor = 0
+        self.last_id = 0
+        self._changed = None
+        self._task = None
+
+    async def start(self):
+        self.last_id = self.floor = await run_in_threadpool(latest_event_id)
+        self._changed = asyncio.Condition()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                rows = await run_in_threadpool(
+                    settled_events, self.last_id, EVENT_BATCH_SIZE
+                )
+            except Exception:
+                rows = []
+            if rows:
+                self.events.extend((row.id, row.service_area_id, row) for row in rows)
+                if len(self.events) > self.size:
+                    drop = len(self.events) - self.size
+                    self.floor = self.events[drop - 1][0]
+                    del self.events[:drop]
+                self.last_id = rows[-1].id
+                async with self._changed:
+                    self._changed.notify_all()
+            # A full batch means there is more to read right away
+            if len(rows) < EVENT_BATCH_SIZE:
+                await asyncio.sleep(self.interval)
+
+    def buffered(self, area_ids: set, after: int) -> list:
+        return [
+            row
+            for event_id, area_id, row in self.events
+            if event_id > after and area_id in area_ids
+        ]
+
+    async def wait(self, timeout: float):
+        try:
+            async with self._changed:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def next_events(self, area_ids, after: int | None, wait: float):
+        # Events for the areas after the cursor, waiting up to `wait` seconds
+        # for some to arrive. Returns (events, next cursor).
+        if self._task is None:
+            raise RuntimeError("event feed is not running")
+        area_ids = set(area_ids)
+        if not area_ids:
+            return [], after or 0
+        if after is None:
+            after = self.last_id
+        if after < self.floor:
+            # Older than the buffer: catch up from the table
+            floor = self.floor
+            rows = await run_in_threadpool(
+                settled_events, after, EVENT_BATCH_SIZE, list(area_ids)
+            )
+            if rows:
+                return [to_event(row) for row in rows], rows[-1].id
+            after = floor
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            rows = self.buffered(area_ids, after)[:EVENT_BATCH_SIZE]
+            if rows:
+                return [to_event(row) for row in rows], rows[-1].id
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                # Nothing for these areas up to last_id, so skip past it
+                return [], max(after, self.last_id)
+            await self.wait(remaining)
+
+
+event_feed = EventFeed(EVENT_POLL_INTERVAL, EVENT_BUFFER_SIZE)
+
+
+def sse_message(event: dict) -> bytes:
+    return (
+        b"id: "
+        + event["id"].encode("ascii")
+        + b"\nevent: "
+        + event["type"].encode("ascii")
+        + b"\ndata: "
+        + orjson.dumps(event)
+        + b"\n\n"
+    )
+
+
+async def sse_stream(area_ids, after: int | None):
+    while True:
+        events, after = await event_feed.next_events(area_ids, after, SSE_KEEPALIVE)
+        if not events:
+            yield b": keepalive\n\n"
+            continue
+        yield b"".join(sse_message(event) for event in events)
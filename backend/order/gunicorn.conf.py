@@ -0,0 +1,47 @@
+# Production entry point: gunicorn -c gunicorn.conf.py main:app
+# Run `python migrate.py` first; workers never change the schema.
+import gc
+import glob
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Import the app once in the master, so the workers share its modules
+# copy-on-write instead of each importing them
+preload_app = os.getenv("PRELOAD_APP", "true").lower() in ("1", "true", "yes")
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+# Counters left by a previous run would be merged into /metrics
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+    for path in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, "*.db")):
+        os.remove(path)
+
+
+def when_ready(server):
+    # Runs in the master after preloading, before any worker is forked
+    if not preload_app:
+        return
+    from catalog import catalog
+
+    catalog.load()
+    # Keep the collector from touching (and so copying) the shared objects
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from database import dispose_engines
+
+    dispose_engines()
+
+
+def child_exit(server, worker):
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
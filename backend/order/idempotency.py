@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from models import IdempotencyKey
+
+# How long a key replays its first response
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+MAX_KEY_LENGTH = 255
+
+
+class ResponseCache:
+    # Per-process LRU in front of the idempotency_keys table
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, request_hash: str, response: dict, expires_at: float):
+        with self._lock:
+            self._entries[key] = (request_hash, response, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+response_cache = ResponseCache(IDEMPOTENCY_CACHE_SIZE)
+
+
+def check_key(key: str) -> str:
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+    return key
+
+
+def request_hash(body) -> str:
+    canonical = json.dumps(jsonable_encoder(body), sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def expires_at(created_at: datetime) -> float:
+    return (created_at - datetime(1970, 1, 1)).total_seconds() + IDEMPOTENCY_TTL
+
+
+def lookup(db: Session, user_id: bytes, key: str, fingerprint: str):
+    # The stored response for this key, or None if the request is new
+    entry = response_cache.get((user_id, key))
+    if entry is None:
+        row = db.execute(
+            select(
+                IdempotencyKey.request_hash,
+                IdempotencyKey.response,
+                IdempotencyKey.created_at,
+            ).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        ).first()
+        if row is None or expires_at(row.created_at) <= time.time():
+            return None
+        entry = (row.request_hash, json.loads(row.response), expires_at(row.created_at))
+        response_cache.set((user_id, key), *entry)
+
+    if entry[0] != fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request",
+        )
+    return entry[1]
+
+
+def store(db: Session, user_id: bytes, key: str, fingerprint: str, response: dict):
+    # Runs inside the caller's transaction, so the key commits together with
+    # the writes it protects. A concurrent duplicate fails on the primary key.
+    created_at = datetime.utcnow()
+    db.execute(
+        delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.created_at < created_at - timedelta(seconds=IDEMPOTENCY_TTL),
+        )
+    )
+    db.execute(
+        insert(IdempotencyKey).values(
+            user_id=user_id,
+            key=key,
+            request_hash=fingerprint,
+            response=json.dumps(response),
+            created_at=created_at,
+        )
+    )
+    return expires_at(created_at)
+
+
+def remember(user_id: bytes, key: str, fingerprint: str, response, expiry: float):
+    # Call after the commit; a rolled-back response must never be replayed
+    response_cache.set((user_id, key), fingerprint, response, expiry)
+
+
+def replay(response: dict) -> JSONResponse:
+    return JSONResponse(response, headers={"Idempotent-Replayed": "true"})
+
+
+def purge_expired(db: Session):
+    cutoff = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL)
+    db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff))
+    db.commit()
@@ -0,0 +1,209 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+from fastapi import HTTPException
+from jose import jwt
+
+from metrics import timed
+from revocation import revocation_list
+
+AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://backend-auth:8000")
+
+# Must match the auth service, which signs the tokens
+SECRET_KEY = os.getenv("SECRET_KEY", "waste_mgmt_project_secret_key")
+ALGORITHM = "HS256"
+
+CLAIMS_CACHE_SIZE = int(os.getenv("CLAIMS_CACHE_SIZE", "10000"))
+CLAIMS_CACHE_TTL = int(os.getenv("CLAIMS_CACHE_TTL", "300"))
+
+# order -> auth HTTP client tuning
+AUTH_TIMEOUT = float(os.getenv("AUTH_TIMEOUT", "2.0"))
+AUTH_CONNECT_TIMEOUT = float(os.getenv("AUTH_CONNECT_TIMEOUT", "1.0"))
+AUTH_MAX_CONNECTIONS = int(os.getenv("AUTH_MAX_CONNECTIONS", "100"))
+AUTH_MAX_KEEPALIVE = int(os.getenv("AUTH_MAX_KEEPALIVE", "20"))
+AUTH_BREAKER_THRESHOLD = int(os.getenv("AUTH_BREAKER_THRESHOLD", "5"))
+AUTH_BREAKER_RESET = float(os.getenv("AUTH_BREAKER_RESET", "10.0"))
+
+# Claims a token must carry to be trusted without asking the auth service
+REQUIRED_CLAIMS = {
+    "user": ("sub", "user_id"),
+    "vendor": ("user_id", "address"),
+}
+
+ME_PATHS = {
+    "user": "/user/me",
+    "vendor": "/vendor/me",
+}
+
+
+class ClaimsCache:
+    # LRU of verified tokens' claims; an entry never outlives its token's `exp`
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def set(self, key, claims: dict, exp=None):
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+claims_cache = ClaimsCache(CLAIMS_CACHE_SIZE, CLAIMS_CACHE_TTL)
+
+
+def bearer_token(authorization: str) -> str:
+    # Expect header: Authorization: Bearer <token>
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Invalid authorization header")
+    return authorization.split(" ", 1)[1]
+
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` consecutive failures, then lets a single
+    # probe through once `reset_timeout` seconds have passed
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = "closed"
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= (
+            self.reset_timeout
+        ):
+            self.state = "half_open"
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.state = "closed"
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class AuthClient:
+    # Shared keep-alive client for /me lookups. Concurrent lookups for the
+    # same token share one in-flight request.
+    def __init__(self, base_url: str, breaker: CircuitBreaker):
+        self.base_url = base_url
+        self.breaker = breaker
+        self._client = None
+        self._inflight = {}
+
+    def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(AUTH_TIMEOUT, connect=AUTH_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=AUTH_MAX_CONNECTIONS,
+                    max_keepalive_connections=AUTH_MAX_KEEPALIVE,
+                ),
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch_identity(self, token: str, kind: str) -> dict:
+        key = (kind, token)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(token, kind))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A cancelled caller must not cancel the lookup other callers wait on
+        return await asyncio.shield(task)
+
+    async def _fetch(self, token: str, kind: str) -> dict:
+        if not self.breaker.allow():
+            raise HTTPException(status_code=503, detail="Auth service unavailable")
+        self.start()
+        try:
+            with timed("auth_request"):
+                response = await self._client.get(
+                    ME_PATHS[kind], headers={"Authorization": f"Bearer {token}"}
+                )
+        except httpx.HTTPError:
+            self.breaker.record_failure()
+            raise HTTPException(status_code=503, detail="Auth service unavailable")
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            raise HTTPException(status_code=503, detail="Auth service unavailable")
+        self.breaker.record_success()
+        if response.status_code != 200:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        return response.json()
+
+
+auth_client = AuthClient(
+    AUTH_SERVICE_URL, CircuitBreaker(AUTH_BREAKER_THRESHOLD, AUTH_BREAKER_RESET)
+)
+
+
+async def resolve_identity(token: str, kind: str) -> dict:
+    # Cached as (claims, token payload). The revocation check runs on every
+    # request, cache hit or not; it is an in-memory lookup.
+    key = (kind, token)
+    cached = claims_cache.get(key)
+    if cached is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except jwt.JWTError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        # Refresh tokens are only good at the auth service's /token/refresh
+        if payload.get("typ", "access") != "access":
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        # Tokens issued before the auth service added these claims still
+        # work, they just cost a round-trip to the auth service
+        if payload.get("kind") == kind and all(
+            payload.get(claim) for claim in REQUIRED_CLAIMS[kind]
+        ):
+            claims = payload
+        else:
+            claims = await auth_client.fetch_identity(token, kind)
+        cached = (claims, payload)
+        claims_cache.set(key, cached, payload.get("exp"))
+
+    claims, payload = cached
+    if revocation_list.is_revoked(payload):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    return claims
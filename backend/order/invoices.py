@@ -0,0 +1,281 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from fpdf import FPDF
+
+from metrics import timed
+
+# SQLite job store, shared by every worker process in the container
+INVOICE_DB_PATH = os.getenv("INVOICE_DB_PATH", "/tmp/invoices.sqlite3")
+INVOICE_WORKERS = int(os.getenv("INVOICE_WORKERS", "2"))
+INVOICE_POLL_INTERVAL = float(os.getenv("INVOICE_POLL_INTERVAL", "1.0"))
+# Jobs left in "rendering" this long are assumed orphaned by a dead worker
+INVOICE_STALE_AFTER = float(os.getenv("INVOICE_STALE_AFTER", "60"))
+INVOICE_RETENTION = float(os.getenv("INVOICE_RETENTION", str(7 * 24 * 3600)))
+INVOICE_CACHE_BYTES = int(os.getenv("INVOICE_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+
+# fpdf2's replacement for pyfpdf's ln=1: continue at the start of the next line
+NEXT_LINE = {"new_x": "LMARGIN", "new_y": "NEXT"}
+
+
+def pdf_hash(pdf: bytes) -> str:
+    # Content address of a rendered invoice; doubles as its ETag
+    return hashlib.sha256(pdf).hexdigest()
+
+
+def render_invoice(invoice: dict) -> bytes:
+    pickup_date = datetime.fromisoformat(invoice["pickup_date"])
+    # Every timestamp comes from the payload, so a re-render is byte-identical
+    # (jobs queued before generated_on was recorded fall back to now)
+    generated_on = (
+        datetime.fromisoformat(invoice["generated_on"])
+        if "generated_on" in invoice
+        else datetime.utcnow()
+    )
+
+    # Generate PDF invoice; fpdf2 would otherwise stamp /CreationDate with now
+    invoice_pdf = FPDF()
+    invoice_pdf.set_creation_date(generated_on.replace(tzinfo=timezone.utc))
+    invoice_pdf.add_page()
+    invoice_pdf.set_font("Helvetica", "B", 16)
+    invoice_pdf.set_text_color(30, 30, 30)
+    invoice_pdf.cell(0, 10, text="Waste Management Invoice", align="C", **NEXT_LINE)
+    invoice_pdf.ln(10)
+
+    invoice_pdf.set_font("Helvetica", "", 12)
+    invoice_pdf.set_text_color(50, 50, 50)
+    invoice_pdf.cell(0, 10, text=f"Username: {invoice['user']}", **NEXT_LINE)
+    invoice_pdf.cell(
+        0, 10, text=f"Pickup Address: {invoice['pickup_address']}", **NEXT_LINE
+    )
+    invoice_pdf.cell(
+        0,
+        10,
+        text=f"Pickup Date: {pickup_date.strftime('%Y-%m-%d %H:%M')}",
+        **NEXT_LINE,
+    )
+    invoice_pdf.ln(10)
+
+    invoice_pdf.set_fill_color(200, 220, 255)
+    invoice_pdf.set_font("Helvetica", "B", 12)
+    invoice_pdf.cell(80, 10, "Item Type", border=1, align="C", fill=True)
+    invoice_pdf.cell(40, 10, "Quantity", border=1, align="C", fill=True, **NEXT_LINE)
+
+    invoice_pdf.set_font("Helvetica", "", 12)
+    for item in invoice["items"]:
+        invoice_pdf.cell(80, 10, item["item_type"], border=1)
+        invoice_pdf.cell(40, 10, str(item["quantity"]), border=1, **NEXT_LINE)
+
+    invoice_pdf.ln(10)
+    invoice_pdf.set_font("Helvetica", "I", 10)
+    invoice_pdf.set_text_color(100, 100, 100)
+    invoice_pdf.cell(
+        0,
+        10,
+        text=f"Generated on {generated_on.strftime('%Y-%m-%d %H:%M UTC')}",
+        align="R",
+        **NEXT_LINE,
+    )
+
+    # Render straight to memory
+    return bytes(invoice_pdf.output())
+
+
+class InvoiceCache:
+    # LRU of rendered PDFs keyed by content hash, bounded by total bytes
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            pdf = self._entries.get(key)
+            if pdf is not None:
+                self._entries.move_to_end(key)
+            return pdf
+
+    def put(self, key: str, pdf: bytes):
+        if len(pdf) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = pdf
+            self.size += len(pdf)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+invoice_cache = InvoiceCache(INVOICE_CACHE_BYTES)
+
+
+class InvoiceQueue:
+    # Durable invoice jobs in SQLite, rendered by a pool of worker threads.
+    # Any process can enqueue or read; workers claim jobs atomically.
+    def __init__(self, path: str, workers: int):
+        self.path = path
+        self.workers = workers
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def create_table(self):
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS invoice_jobs ("
+            "id TEXT PRIMARY KEY, user_id TEXT, status TEXT, payload TEXT, "
+            "pdf BLOB, error TEXT, created_at REAL, claimed_at REAL, "
+            "pdf_hash TEXT)"
+        )
+        columns = {
+            row["name"] for row in conn.execute("PRAGMA table_info(invoice_jobs)")
+        }
+        if "pdf_hash" not in columns:
+            conn.execute("ALTER TABLE invoice_jobs ADD COLUMN pdf_hash TEXT")
+        # Jobs rendered before pdf_hash existed get it from their stored bytes
+        for row in conn.execute(
+            "SELECT id, pdf FROM invoice_jobs "
+            "WHERE status = 'ready' AND pdf_hash IS NULL"
+        ).fetchall():
+            conn.execute(
+                "UPDATE invoice_jobs SET pdf_hash = ? WHERE id = ?",
+                (pdf_hash(row["pdf"]), row["id"]),
+            )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_invoice_jobs_status "
+            "ON invoice_jobs (status, created_at)"
+        )
+
+    def start(self):
+        self.create_table()
+        self._connection().execute(
+            "DELETE FROM invoice_jobs WHERE created_at < ?",
+            (time.time() - INVOICE_RETENTION,),
+        )
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"invoice-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def enqueue(self, user_id: str, invoice: dict, invoice_id: str = None) -> str:
+        invoice_id = invoice_id or str(uuid4())
+        self._connection().execute(
+            "INSERT INTO invoice_jobs "
+            "(id, user_id, status, payload, created_at) "
+            "VALUES (?, ?, 'pending', ?, ?)",
+            (invoice_id, user_id, json.dumps(invoice), time.time()),
+        )
+        with self._wakeup:
+            self._wakeup.notify()
+        return invoice_id
+
+    def get(self, invoice_id: str):
+        # Job metadata only; the PDF itself comes from fetch_pdf
+        return (
+            self._connection()
+            .execute(
+                "SELECT id, user_id, status, error, pdf_hash "
+                "FROM invoice_jobs WHERE id = ?",
+                (invoice_id,),
+            )
+            .fetchone()
+        )
+
+    def fetch_pdf(self, job) -> bytes:
+        # Keyed by the hash of the stored bytes, so every worker serves the
+        # exact file its ETag names
+        pdf = invoice_cache.get(job["pdf_hash"])
+        if pdf is None:
+            pdf = (
+                self._connection()
+                .execute("SELECT pdf FROM invoice_jobs WHERE id = ?", (job["id"],))
+                .fetchone()["pdf"]
+            )
+            invoice_cache.put(job["pdf_hash"], pdf)
+        return pdf
+
+    def _claim(self):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, payload FROM invoice_jobs "
+                "WHERE status = 'pending' "
+                "OR (status = 'rendering' AND claimed_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now - INVOICE_STALE_AFTER,),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE invoice_jobs SET status = 'rendering', claimed_at = ? "
+                    "WHERE id = ?",
+                    (now, row["id"]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def _work(self):
+        while not self._stop.is_set():
+            job = self._claim()
+            if job is None:
+                # Also polls, to pick up jobs enqueued by other processes
+                with self._wakeup:
+                    self._wakeup.wait(INVOICE_POLL_INTERVAL)
+                continue
+            try:
+                with timed("invoice_render"):
+                    pdf = render_invoice(json.loads(job["payload"]))
+            except Exception as exc:
+                self._connection().execute(
+                    "UPDATE invoice_jobs SET status = 'failed', error = ? "
+                    "WHERE id = ?",
+                    (str(exc), job["id"]),
+                )
+                continue
+            digest = pdf_hash(pdf)
+            invoice_cache.put(digest, pdf)
+            self._connection().execute(
+                "UPDATE invoice_jobs SET status = 'ready', pdf = ?, pdf_hash = ? "
+                "WHERE id = ?",
+                (pdf, digest, job["id"]),
+            )
+
+
+invoice_queue = InvoiceQueue(INVOICE_DB_PATH, INVOICE_WORKERS)
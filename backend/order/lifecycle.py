@@ -0,0 +1,76 @@
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from events import record_events
+from listing import load_items, uuid_str
+from models import OrderHeader
+from rollups import item_rows, move_status
+
+STATUSES = ("placed", "accepted", "picked_up", "settled")
+# Target status -> the status an order must be in to move there
+TRANSITIONS = {
+    "accepted": "placed",
+    "picked_up": "accepted",
+    "settled": "picked_up",
+}
+
+SNAPSHOT_COLUMNS = (
+    OrderHeader.id,
+    OrderHeader.service_area_id,
+    OrderHeader.pickup_date,
+    OrderHeader.order_date,
+    OrderHeader.user_name,
+    OrderHeader.pickup_address,
+    OrderHeader.status,
+    OrderHeader.vendor_id,
+)
+
+
+def transition(db: Session, order_ids, status: str, vendor_id: bytes, area_ids):
+    # Moves every order or none. Runs inside the caller's transaction and
+    # writes the rollup shift of their items and one outbox event per order.
+    previous = TRANSITIONS[status]
+    rows = (
+        db.execute(select(*SNAPSHOT_COLUMNS).where(OrderHeader.id.in_(order_ids)))
+        .mappings()
+        .all()
+    )
+    if len(rows) != len(order_ids):
+        raise HTTPException(status_code=404, detail="Order not found")
+    for row in rows:
+        if row["service_area_id"] not in area_ids:
+            raise HTTPException(status_code=404, detail="Order not found")
+        if row["status"] != previous:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Order {uuid_str(row['id'])} is {row['status']}",
+            )
+        if previous != "placed" and row["vendor_id"] != vendor_id:
+            raise HTTPException(
+                status_code=403, detail="Order was accepted by another vendor"
+            )
+
+    # Compare-and-set, so a concurrent transition of the same orders loses
+    stmt = update(OrderHeader).where(
+        OrderHeader.id.in_(order_ids), OrderHeader.status == previous
+    )
+    if previous != "placed":
+        stmt = stmt.where(OrderHeader.vendor_id == vendor_id)
+    result = db.execute(
+        stmt.values(status=status, vendor_id=vendor_id).execution_options(
+            synchronize_session=False
+        )
+    )
+    if result.rowcount != len(rows):
+        raise HTTPException(status_code=409, detail="Order was changed concurrently")
+
+    items = load_items(db, order_ids)
+    move_status(
+        db,
+        [item for row in rows for item in item_rows(row, items[row["id"]])],
+        previous,
+        status,
+    )
+    record_events(db, rows, items, status, vendor_id)
+    return [{"order_id": uuid_str(row["id"]), "status": status} for row in rows]
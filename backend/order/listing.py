@@ -0,0 +1,202 @@
+import base64
+import os
+from datetime import datetime
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import and_, or_, select
+
+from database import AsyncReadSessionLocal, ReadSessionLocal
+from models import OrderHeader, OrderItem
+
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+# Rows fetched per server-side cursor batch, and per chunk written out
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+
+
+# Listings select plain tuples of these columns, never ORM entities
+ORDER_COLUMNS = (
+    OrderHeader.id,
+    OrderHeader.pickup_date,
+    OrderHeader.order_date,
+    OrderHeader.user_name,
+    OrderHeader.pickup_address,
+    OrderHeader.status,
+)
+ITEM_COLUMNS = (
+    OrderItem.order_id,
+    OrderItem.id,
+    OrderItem.item_type,
+    OrderItem.quantity,
+)
+
+
+class ORJSONResponse(JSONResponse):
+    # Serializes datetimes natively, so listings skip jsonable_encoder
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+def select_orders():
+    return select(*ORDER_COLUMNS)
+
+
+def uuid_str(raw: bytes) -> str:
+    h = raw.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def item_dict(item_id: bytes, item_type: str, quantity: float) -> dict:
+    return {"item_id": uuid_str(item_id), "item_type": item_type, "quantity": quantity}
+
+
+def select_items(order_ids):
+    return select(*ITEM_COLUMNS).where(OrderItem.order_id.in_(order_ids))
+
+
+def id_batches(order_ids):
+    # Unpaged listings can hold any number of orders; keep each IN list small
+    for start in range(0, len(order_ids), STREAM_BATCH_SIZE):
+        yield order_ids[start : start + STREAM_BATCH_SIZE]
+
+
+def load_items(db, order_ids) -> dict:
+    # The items of many orders, one query per STREAM_BATCH_SIZE orders
+    items = {order_id: [] for order_id in order_ids}
+    for batch in id_batches(order_ids):
+        for order_id, item_id, item_type, quantity in db.execute(select_items(batch)):
+            items[order_id].append(item_dict(item_id, item_type, quantity))
+    return items
+
+
+async def load_items_async(db, order_ids) -> dict:
+    items = {order_id: [] for order_id in order_ids}
+    for batch in id_batches(order_ids):
+        rows = await db.execute(select_items(batch))
+        for order_id, item_id, item_type, quantity in rows:
+            items[order_id].append(item_dict(item_id, item_type, quantity))
+    return items
+
+
+def rows_to_dicts(rows, items: dict) -> list:
+    return [
+        {
+            "order_id": uuid_str(order_id),
+            "pickup_date": pickup_date,
+            "order_date": order_date,
+            "user_name": user_name,
+            "pickup_address": pickup_address,
+            "status": status,
+            "items": items[order_id],
+        }
+        for (
+            order_id,
+            pickup_date,
+            order_date,
+            user_name,
+            pickup_address,
+            status,
+        ) in rows
+    ]
+
+
+def encode_cursor(row) -> str:
+    raw = f"{row.order_date.isoformat()}|{row.id.hex()}"
+    return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii")
+        order_date, order_id = raw.split("|")
+        return datetime.fromisoformat(order_date), bytes.fromhex(order_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset(stmt, cursor: str | None):
+    # Newest first on (order_date, id), resuming strictly after the cursor
+    if cursor:
+        order_date, order_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            or_(
+                OrderHeader.order_date < order_date,
+                and_(OrderHeader.order_date == order_date, OrderHeader.id < order_id),
+            )
+        )
+    return stmt.order_by(OrderHeader.order_date.desc(), OrderHeader.id.desc())
+
+
+def trim_page(rows, limit: int | None):
+    # Fetching one extra row tells us whether there is a next page
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def page_response(rows, items: dict, next_cursor: str | None) -> ORJSONResponse:
+    return ORJSONResponse(
+        {
+            "status": "success",
+            "orders": rows_to_dicts(rows, items),
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+def ndjson_chunk(rows, items: dict) -> bytes:
+    return b"".join(orjson.dumps(order) + b"\n" for order in rows_to_dicts(rows, items))
+
+
+def stream_orders(stmt):
+    # Own sessions: the request's may be closed before streaming ends, and
+    # the item lookups can't share a connection with an open streaming cursor
+    db = ReadSessionLocal()
+    items_db = ReadSessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+        for batch in result.partitions():
+            items = load_items(items_db, [row.id for row in batch])
+            yield ndjson_chunk(batch, items)
+    finally:
+        items_db.close()
+        db.close()
+
+
+async def stream_orders_async(stmt):
+    async with AsyncReadSessionLocal() as db, AsyncReadSessionLocal() as items_db:
+        result = await db.stream(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for batch in result.partitions():
+            items = await load_items_async(items_db, [row.id for row in batch])
+            yield ndjson_chunk(batch, items)
+
+
+def limited(stmt, limit: int | None, extra: int = 0):
+    return stmt if limit is None else stmt.limit(limit + extra)
+
+
+def list_orders(db, stmt, limit: int | None, cursor: str | None, fmt: str):
+    stmt = keyset(stmt, cursor)
+    if fmt == "ndjson":
+        return StreamingResponse(
+            stream_orders(limited(stmt, limit)), media_type="application/x-ndjson"
+        )
+    rows, next_cursor = trim_page(db.execute(limited(stmt, limit, 1)).all(), limit)
+    items = load_items(db, [row.id for row in rows])
+    return page_response(rows, items, next_cursor)
+
+
+async def list_orders_async(db, stmt, limit: int | None, cursor: str | None, fmt):
+    stmt = keyset(stmt, cursor)
+    if fmt == "ndjson":
+        return StreamingResponse(
+            stream_orders_async(limited(stmt, limit)),
+            media_type="application/x-ndjson",
+        )
+    rows, next_cursor = trim_page(
+        (await db.execute(limited(stmt, limit, 1))).all(), limit
+    )
+    items = await load_items_async(db, [row.id for row in rows])
+    return page_response(rows, items, next_cursor)
@@ -0,0 +1,11 @@
+# One-shot schema migration, run once per deploy before the workers start
+# (the services no longer touch the schema on import). Same as running
+# `alembic upgrade head` from this directory.
+import os
+
+from alembic import command
+from alembic.config import Config
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    command.upgrade(Config(os.path.join(here, "alembic.ini")), "head")
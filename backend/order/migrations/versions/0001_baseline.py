@@ -0,0 +1,38 @@
+"""orders table as created by Base.metadata.create_all
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Databases created before migrations existed already have this table:
+run `alembic stamp 0001` once, then `alembic upgrade head`.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.mysql import BINARY
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "orders",
+        sa.Column("id", BINARY(16), primary_key=True),
+        sa.Column("user_id", BINARY(16)),
+        sa.Column("user_name", sa.String(255)),
+        sa.Column("item_type", sa.String(255)),
+        sa.Column("quantity", sa.Float),
+        sa.Column("pickup_date", sa.DateTime),
+        sa.Column("order_date", sa.DateTime),
+        sa.Column("pickup_address", sa.String(255)),
+    )
+    op.create_index("ix_orders_id", "orders", ["id"])
+
+
+def downgrade():
+    op.drop_index("ix_orders_id", table_name="orders")
+    op.drop_table("orders")
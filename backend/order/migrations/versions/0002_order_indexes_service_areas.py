@@ -0,0 +1,98 @@
+"""order lookup indexes and service areas
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Adds the (user_id, order_date) index behind GET /orders, the
+service_areas / vendor_service_areas tables and orders.service_area_id,
+then backfills service_area_id one pickup address at a time.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.mysql import BINARY
+
+from areas import area_key
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH = 1000
+
+
+def upgrade():
+    op.create_table(
+        "service_areas",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("key", sa.String(255), nullable=False, unique=True),
+        sa.Column("name", sa.String(255)),
+    )
+    op.create_table(
+        "vendor_service_areas",
+        sa.Column("vendor_id", BINARY(16), primary_key=True),
+        sa.Column(
+            "service_area_id",
+            sa.Integer,
+            sa.ForeignKey("service_areas.id"),
+            primary_key=True,
+        ),
+    )
+    with op.batch_alter_table("orders") as batch:
+        batch.add_column(sa.Column("service_area_id", sa.Integer))
+        batch.create_foreign_key(
+            "fk_orders_service_area_id", "service_areas", ["service_area_id"], ["id"]
+        )
+    op.create_index("ix_orders_user_id_order_date", "orders", ["user_id", "order_date"])
+    op.create_index(
+        "ix_orders_service_area_id_order_date",
+        "orders",
+        ["service_area_id", "order_date"],
+    )
+    backfill_service_areas()
+
+
+def backfill_service_areas():
+    conn = op.get_bind()
+    area_ids = dict(conn.execute(sa.text("SELECT `key`, id FROM service_areas")).all())
+    while True:
+        addresses = (
+            conn.execute(
+                sa.text(
+                    "SELECT DISTINCT pickup_address FROM orders "
+                    "WHERE service_area_id IS NULL AND pickup_address IS NOT NULL "
+                    "LIMIT :limit"
+                ),
+                {"limit": BACKFILL_BATCH},
+            )
+            .scalars()
+            .all()
+        )
+        if not addresses:
+            break
+        for address in addresses:
+            key = area_key(address)
+            if key not in area_ids:
+                area_ids[key] = conn.execute(
+                    sa.text("INSERT INTO service_areas (`key`, name) VALUES (:k, :n)"),
+                    {"k": key, "n": address},
+                ).lastrowid
+            conn.execute(
+                sa.text(
+                    "UPDATE orders SET service_area_id = :area "
+                    "WHERE pickup_address = :address AND service_area_id IS NULL"
+                ),
+                {"area": area_ids[key], "address": address},
+            )
+
+
+def downgrade():
+    op.drop_index("ix_orders_service_area_id_order_date", table_name="orders")
+    op.drop_index("ix_orders_user_id_order_date", table_name="orders")
+    with op.batch_alter_table("orders") as batch:
+        batch.drop_constraint("fk_orders_service_area_id", type_="foreignkey")
+        batch.drop_column("service_area_id")
+    op.drop_table("vendor_service_areas")
+    op.drop_table("service_areas")
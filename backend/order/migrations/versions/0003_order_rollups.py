@@ -0,0 +1,31 @@
+"""order rollups for the vendor dashboard summary
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Fill the table afterwards with `python rollups.py rebuild`.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "order_rollups",
+        sa.Column("service_area_id", sa.Integer, primary_key=True),
+        sa.Column("dimension", sa.String(20), primary_key=True),
+        sa.Column("bucket", sa.String(255), primary_key=True),
+        sa.Column("item_count", sa.Integer, nullable=False),
+        sa.Column("total_quantity", sa.Float, nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("order_rollups")
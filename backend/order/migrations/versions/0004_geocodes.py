@@ -0,0 +1,35 @@
+"""geocodes for vendor route planning
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Load coordinates afterwards with `python routes.py import-geocodes FILE.csv`.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "geocodes",
+        sa.Column("key", sa.String(255), primary_key=True),
+        sa.Column("latitude", sa.Float, nullable=False),
+        sa.Column("longitude", sa.Float, nullable=False),
+    )
+    op.create_index(
+        "ix_orders_service_area_id_pickup_date",
+        "orders",
+        ["service_area_id", "pickup_date"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_orders_service_area_id_pickup_date", table_name="orders")
+    op.drop_table("geocodes")
@@ -0,0 +1,49 @@
+"""order status lifecycle and the order_events outbox
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.mysql import BINARY
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Both columns carry a constant default, so MySQL 8 adds them in place
+    # without copying the table
+    op.add_column(
+        "orders",
+        sa.Column("status", sa.String(20), nullable=False, server_default="placed"),
+    )
+    op.add_column("orders", sa.Column("vendor_id", BINARY(16)))
+    op.create_table(
+        "order_events",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("order_id", BINARY(16), nullable=False),
+        sa.Column("service_area_id", sa.Integer),
+        sa.Column("event_type", sa.String(20), nullable=False),
+        sa.Column("vendor_id", BINARY(16)),
+        sa.Column("payload", sa.Text, nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+    )
+    op.create_index(
+        "ix_order_events_service_area_id_id",
+        "order_events",
+        ["service_area_id", "id"],
+    )
+    op.create_index("ix_order_events_created_at", "order_events", ["created_at"])
+
+
+def downgrade():
+    op.drop_index("ix_order_events_created_at", table_name="order_events")
+    op.drop_index("ix_order_events_service_area_id_id", table_name="order_events")
+    op.drop_table("order_events")
+    op.drop_column("orders", "vendor_id")
+    op.drop_column("orders", "status")
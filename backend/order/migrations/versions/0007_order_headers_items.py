@@ -0,0 +1,75 @@
+"""order_headers + order_items
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+Only creates the new tables. Copy the legacy orders rows across with
+`python backfill.py orders` while the service is running; the orders table
+stays until every row has been copied.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.mysql import BINARY
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "order_headers",
+        sa.Column("id", BINARY(16), primary_key=True),
+        sa.Column("user_id", BINARY(16)),
+        sa.Column("user_name", sa.String(255)),
+        sa.Column("pickup_date", sa.DateTime),
+        sa.Column("order_date", sa.DateTime),
+        sa.Column("pickup_address", sa.String(255)),
+        sa.Column("service_area_id", sa.Integer, sa.ForeignKey("service_areas.id")),
+        sa.Column("status", sa.String(20), nullable=False, server_default="placed"),
+        sa.Column("vendor_id", BINARY(16)),
+    )
+    op.create_index(
+        "ix_order_headers_user_id_order_date",
+        "order_headers",
+        ["user_id", "order_date"],
+    )
+    op.create_index(
+        "ix_order_headers_service_area_id_order_date",
+        "order_headers",
+        ["service_area_id", "order_date"],
+    )
+    op.create_index(
+        "ix_order_headers_service_area_id_pickup_date",
+        "order_headers",
+        ["service_area_id", "pickup_date"],
+    )
+    op.create_table(
+        "order_items",
+        sa.Column("id", BINARY(16), primary_key=True),
+        sa.Column(
+            "order_id",
+            BINARY(16),
+            sa.ForeignKey("order_headers.id"),
+            nullable=False,
+        ),
+        sa.Column("item_type", sa.String(255)),
+        sa.Column("quantity", sa.Float),
+    )
+    op.create_index("ix_order_items_order_id", "order_items", ["order_id"])
+
+
+def downgrade():
+    op.drop_index("ix_order_items_order_id", table_name="order_items")
+    op.drop_table("order_items")
+    op.drop_index(
+        "ix_order_headers_service_area_id_pickup_date", table_name="order_headers"
+    )
+    op.drop_index(
+        "ix_order_headers_service_area_id_order_date", table_name="order_headers"
+    )
+    op.drop_index("ix_order_headers_user_id_order_date", table_name="order_headers")
+    op.drop_table("order_headers")
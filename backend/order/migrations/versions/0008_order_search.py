@@ -0,0 +1,79 @@
+"""order_search documents behind a full-text index
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+MySQL indexes the documents with a FULLTEXT index using the ngram parser;
+SQLite with an FTS5 table of words and the service area, kept in step by
+triggers. Write documents for existing orders afterwards with
+`python search.py index`.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.mysql import BINARY
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+SQLITE_INDEX = [
+    "CREATE VIRTUAL TABLE order_search_fts USING fts5(document, "
+    "service_area_id, content='order_search', content_rowid='id', "
+    "tokenize='unicode61', prefix='2 3')",
+    # The indexed words, to expand a prefix into the words it starts
+    "CREATE VIRTUAL TABLE order_search_vocab "
+    "USING fts5vocab(order_search_fts, 'col')",
+    "CREATE TRIGGER order_search_ai AFTER INSERT ON order_search BEGIN "
+    "INSERT INTO order_search_fts(rowid, document, service_area_id) "
+    "VALUES (new.id, new.document, new.service_area_id); END",
+    "CREATE TRIGGER order_search_ad AFTER DELETE ON order_search BEGIN "
+    "INSERT INTO order_search_fts"
+    "(order_search_fts, rowid, document, service_area_id) "
+    "VALUES ('delete', old.id, old.document, old.service_area_id); END",
+    "CREATE TRIGGER order_search_au AFTER UPDATE ON order_search BEGIN "
+    "INSERT INTO order_search_fts"
+    "(order_search_fts, rowid, document, service_area_id) "
+    "VALUES ('delete', old.id, old.document, old.service_area_id); "
+    "INSERT INTO order_search_fts(rowid, document, service_area_id) "
+    "VALUES (new.id, new.document, new.service_area_id); END",
+]
+
+
+def upgrade():
+    op.create_table(
+        "order_search",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column(
+            "order_id",
+            BINARY(16),
+            sa.ForeignKey("order_headers.id"),
+            nullable=False,
+            unique=True,
+        ),
+        sa.Column("service_area_id", sa.Integer, sa.ForeignKey("service_areas.id")),
+        sa.Column("order_date", sa.DateTime),
+        sa.Column("document", sa.Text, nullable=False),
+    )
+    op.create_index(
+        "ix_order_search_service_area_id", "order_search", ["service_area_id"]
+    )
+    dialect = op.get_bind().dialect.name
+    if dialect == "mysql":
+        op.execute(
+            "ALTER TABLE order_search ADD FULLTEXT INDEX ft_order_search_document "
+            "(document) WITH PARSER ngram"
+        )
+    elif dialect == "sqlite":
+        for statement in SQLITE_INDEX:
+            op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TABLE IF EXISTS order_search_vocab")
+        op.execute("DROP TABLE IF EXISTS order_search_fts")
+    op.drop_index("ix_order_search_service_area_id", table_name="order_search")
+    op.drop_table("order_search")
@@ -0,0 +1,40 @@
+"""microsecond order_events.created_at
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+
+MySQL's DATETIME keeps whole seconds, which shifts an event's age by up to
+a second against EVENT_SETTLE_MS. SQLite stores the full value already.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.mysql import DATETIME
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "mysql":
+        op.alter_column(
+            "order_events",
+            "created_at",
+            existing_type=sa.DateTime,
+            type_=DATETIME(fsp=6),
+            existing_nullable=False,
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "mysql":
+        op.alter_column(
+            "order_events",
+            "created_at",
+            existing_type=DATETIME(fsp=6),
+            type_=sa.DateTime,
+            existing_nullable=False,
+        )
@@ -0,0 +1,126 @@
+"""service areas keyed by PIN code or locality
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+
+Areas used to be keyed by the whole normalized address, so every address was
+an area of its own. This re-keys them with the current areas.area_key and
+merges the areas that now share a key into the oldest one, moving orders,
+search documents, events, rollups and vendor mappings with them.
+"""
+
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+from areas import area_key
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+# Tables whose service_area_id is a plain column to repoint
+AREA_COLUMNS = ("orders", "order_headers", "order_search", "order_events")
+
+
+def upgrade():
+    conn = op.get_bind()
+    groups = defaultdict(list)
+    for area_id, key, name in conn.execute(
+        sa.text("SELECT id, `key`, name FROM service_areas ORDER BY id")
+    ):
+        groups[area_key(name or key)].append(area_id)
+
+    for area_ids in groups.values():
+        keep, merged = area_ids[0], area_ids[1:]
+        for area_id in merged:
+            merge_area(conn, area_id, keep)
+
+    # Through a placeholder, since a new key may still be another area's old one
+    params = [{"id": ids[0], "key": key} for key, ids in groups.items()]
+    if params:
+        conn.execute(
+            sa.text("UPDATE service_areas SET `key` = :placeholder WHERE id = :id"),
+            [{"id": p["id"], "placeholder": f"#{p['id']}"} for p in params],
+        )
+        conn.execute(
+            sa.text("UPDATE service_areas SET `key` = :key WHERE id = :id"), params
+        )
+
+
+def merge_area(conn, old: int, new: int):
+    ids = {"old": old, "new": new}
+    for table in AREA_COLUMNS:
+        conn.execute(
+            sa.text(
+                f"UPDATE {table} SET service_area_id = :new "
+                "WHERE service_area_id = :old"
+            ),
+            ids,
+        )
+
+    vendors = conn.execute(
+        sa.text(
+            "SELECT vendor_id FROM vendor_service_areas "
+            "WHERE service_area_id = :old AND vendor_id NOT IN "
+            "(SELECT vendor_id FROM vendor_service_areas "
+            "WHERE service_area_id = :new)"
+        ),
+        ids,
+    ).scalars()
+    rows = [{"vendor_id": vendor_id, "new": new} for vendor_id in vendors]
+    if rows:
+        conn.execute(
+            sa.text(
+                "INSERT INTO vendor_service_areas (vendor_id, service_area_id) "
+                "VALUES (:vendor_id, :new)"
+            ),
+            rows,
+        )
+    conn.execute(
+        sa.text("DELETE FROM vendor_service_areas WHERE service_area_id = :old"), ids
+    )
+
+    # Rollups are additive, so the merged area's counts add onto the kept one's
+    for dimension, bucket, item_count, total_quantity in conn.execute(
+        sa.text(
+            "SELECT dimension, bucket, item_count, total_quantity "
+            "FROM order_rollups WHERE service_area_id = :old"
+        ),
+        ids,
+    ).all():
+        row = dict(
+            ids,
+            dimension=dimension,
+            bucket=bucket,
+            item_count=item_count,
+            total_quantity=total_quantity,
+        )
+        updated = conn.execute(
+            sa.text(
+                "UPDATE order_rollups SET item_count = item_count + :item_count, "
+                "total_quantity = total_quantity + :total_quantity "
+                "WHERE service_area_id = :new AND dimension = :dimension "
+                "AND bucket = :bucket"
+            ),
+            row,
+        )
+        if not updated.rowcount:
+            conn.execute(
+                sa.text(
+                    "INSERT INTO order_rollups (service_area_id, dimension, bucket, "
+                    "item_count, total_quantity) "
+                    "VALUES (:new, :dimension, :bucket, :item_count, :total_quantity)"
+                ),
+                row,
+            )
+    conn.execute(sa.text("DELETE FROM order_rollups WHERE service_area_id = :old"), ids)
+    conn.execute(sa.text("DELETE FROM service_areas WHERE id = :old"), ids)
+
+
+def downgrade():
+    # Merged areas can't be split again; the new keys stay and still work
+    pass
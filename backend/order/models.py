@@ -0,0 +1,226 @@
+from uuid import uuid4
+
+from sqlalchemy import (
+    DDL,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    event,
+)
+from sqlalchemy.dialects.mysql import BINARY, DATETIME
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+
+# One pickup request; its items are OrderItem rows
+class OrderHeader(Base):
+    __tablename__ = "order_headers"
+
+    id = Column(BINARY(16), primary_key=True, default=lambda: uuid4().bytes)
+    user_id = Column(BINARY(16))
+    user_name = Column(String(255))
+    pickup_date = Column(DateTime)
+    order_date = Column(DateTime)
+    pickup_address = Column(String(255))
+    service_area_id = Column(Integer, ForeignKey("service_areas.id"))
+    # placed -> accepted -> picked_up -> settled, see lifecycle.py
+    status = Column(
+        String(20), nullable=False, default="placed", server_default="placed"
+    )
+    # The vendor that accepted the order
+    vendor_id = Column(BINARY(16))
+
+    __table_args__ = (
+        Index("ix_order_headers_user_id_order_date", "user_id", "order_date"),
+        Index(
+            "ix_order_headers_service_area_id_order_date",
+            "service_area_id",
+            "order_date",
+        ),
+        Index(
+            "ix_order_headers_service_area_id_pickup_date",
+            "service_area_id",
+            "pickup_date",
+        ),
+    )
+
+
+class OrderItem(Base):
+    __tablename__ = "order_items"
+
+    id = Column(BINARY(16), primary_key=True, default=lambda: uuid4().bytes)
+    order_id = Column(
+        BINARY(16), ForeignKey("order_headers.id"), nullable=False, index=True
+    )
+    item_type = Column(String(255))
+    quantity = Column(Float)
+
+
+# Searchable text of an order (pickup address and item types) for vendor
+# search, written with the order; see search.py
+class OrderSearch(Base):
+    __tablename__ = "order_search"
+
+    # Integer key: SQLite's full-text table refers to rows by it
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    order_id = Column(
+        BINARY(16), ForeignKey("order_headers.id"), nullable=False, unique=True
+    )
+    service_area_id = Column(Integer, ForeignKey("service_areas.id"), index=True)
+    order_date = Column(DateTime)
+    document = Column(Text, nullable=False)
+
+
+# The full-text index over order_search has no portable Index form: MySQL
+# gets a FULLTEXT index with the ngram parser (substring matches), SQLite an
+# FTS5 table of words kept in step by triggers. The FTS5 table also indexes
+# the area, so a search reads only the vendor's part of the index. Migration
+# 0008 runs the same statements.
+SEARCH_INDEX_DDL = {
+    "mysql": [
+        "ALTER TABLE order_search ADD FULLTEXT INDEX ft_order_search_document "
+        "(document) WITH PARSER ngram",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE order_search_fts USING fts5(document, "
+        "service_area_id, content='order_search', content_rowid='id', "
+        "tokenize='unicode61', prefix='2 3')",
+        # The indexed words, to expand a prefix into the words it starts
+        "CREATE VIRTUAL TABLE order_search_vocab "
+        "USING fts5vocab(order_search_fts, 'col')",
+        "CREATE TRIGGER order_search_ai AFTER INSERT ON order_search BEGIN "
+        "INSERT INTO order_search_fts(rowid, document, service_area_id) "
+        "VALUES (new.id, new.document, new.service_area_id); END",
+        "CREATE TRIGGER order_search_ad AFTER DELETE ON order_search BEGIN "
+        "INSERT INTO order_search_fts"
+        "(order_search_fts, rowid, document, service_area_id) "
+        "VALUES ('delete', old.id, old.document, old.service_area_id); END",
+        "CREATE TRIGGER order_search_au AFTER UPDATE ON order_search BEGIN "
+        "INSERT INTO order_search_fts"
+        "(order_search_fts, rowid, document, service_area_id) "
+        "VALUES ('delete', old.id, old.document, old.service_area_id); "
+        "INSERT INTO order_search_fts(rowid, document, service_area_id) "
+        "VALUES (new.id, new.document, new.service_area_id); END",
+    ],
+}
+
+for _dialect, _statements in SEARCH_INDEX_DDL.items():
+    for _statement in _statements:
+        event.listen(
+            OrderSearch.__table__,
+            "after_create",
+            DDL(_statement).execute_if(dialect=_dialect),
+        )
+for _statement in (
+    "DROP TABLE IF EXISTS order_search_vocab",
+    "DROP TABLE IF EXISTS order_search_fts",
+):
+    event.listen(
+        OrderSearch.__table__,
+        "before_drop",
+        DDL(_statement).execute_if(dialect="sqlite"),
+    )
+
+
+# Legacy one-row-per-item orders. Nothing writes here any more; backfill.py
+# copies the rows into order_headers/order_items until the table is dropped.
+class Order(Base):
+    __tablename__ = "orders"
+
+    id = Column(BINARY(16), primary_key=True, index=True, default=lambda: uuid4().bytes)
+    user_id = Column(BINARY(16))
+    user_name = Column(String(255))
+    item_type = Column(String(255))
+    quantity = Column(Float)
+    pickup_date = Column(DateTime)
+    order_date = Column(DateTime)
+    pickup_address = Column(String(255))
+    service_area_id = Column(Integer, ForeignKey("service_areas.id"))
+    status = Column(
+        String(20), nullable=False, default="placed", server_default="placed"
+    )
+    vendor_id = Column(BINARY(16))
+
+    __table_args__ = (
+        Index("ix_orders_user_id_order_date", "user_id", "order_date"),
+        Index("ix_orders_service_area_id_order_date", "service_area_id", "order_date"),
+        Index(
+            "ix_orders_service_area_id_pickup_date", "service_area_id", "pickup_date"
+        ),
+    )
+
+
+# Pickup area: a PIN code or locality, see areas.area_key
+class ServiceArea(Base):
+    __tablename__ = "service_areas"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    key = Column(String(255), unique=True, nullable=False)
+    name = Column(String(255))
+
+
+# Which areas a vendor serves
+class VendorServiceArea(Base):
+    __tablename__ = "vendor_service_areas"
+
+    vendor_id = Column(BINARY(16), primary_key=True)
+    service_area_id = Column(Integer, ForeignKey("service_areas.id"), primary_key=True)
+
+
+# Per-area item totals along one dimension ("category", "pickup_day",
+# "status"), kept in step with orders by rollups.apply_rollups
+class OrderRollup(Base):
+    __tablename__ = "order_rollups"
+
+    service_area_id = Column(Integer, primary_key=True)
+    dimension = Column(String(20), primary_key=True)
+    bucket = Column(String(255), primary_key=True)
+    item_count = Column(Integer, nullable=False, default=0)
+    total_quantity = Column(Float, nullable=False, default=0.0)
+
+
+# Coordinates of a pickup address, keyed by areas.address_key
+class Geocode(Base):
+    __tablename__ = "geocodes"
+
+    key = Column(String(255), primary_key=True)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+
+
+# Outbox of order changes, written in the same transaction as the change.
+# Vendors read it incrementally by id, see events.py
+class OrderEvent(Base):
+    __tablename__ = "order_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    order_id = Column(BINARY(16), nullable=False)
+    service_area_id = Column(Integer)
+    event_type = Column(String(20), nullable=False)
+    vendor_id = Column(BINARY(16))
+    payload = Column(Text, nullable=False)
+    # Sub-second, so the EVENT_SETTLE_MS window is measured exactly
+    created_at = Column(
+        DateTime().with_variant(DATETIME(fsp=6), "mysql"), nullable=False, index=True
+    )
+
+    __table_args__ = (
+        Index("ix_order_events_service_area_id_id", "service_area_id", "id"),
+    )
+
+
+# Stored first response per (user, Idempotency-Key) for POST /order retries
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(BINARY(16), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, index=True)
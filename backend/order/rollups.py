@@ -0,0 +1,171 @@
+import argparse
+from collections import defaultdict
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from catalog import catalog
+from models import OrderHeader, OrderItem, OrderRollup
+
+DIMENSIONS = ("category", "pickup_day", "status")
+
+
+def rollup_buckets(row: dict):
+    return (
+        ("category", catalog.category_of(row["item_type"])),
+        ("pickup_day", row["pickup_date"].date().isoformat()),
+        ("status", row.get("status") or "placed"),
+    )
+
+
+def item_rows(header: dict, items) -> list:
+    # Rollups count items; each carries its order's area, day and status
+    return [
+        dict(header, item_type=item["item_type"], quantity=item["quantity"])
+        for item in items
+    ]
+
+
+def rollup_deltas(rows) -> dict:
+    deltas = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        if row["service_area_id"] is None:
+            continue
+        for dimension, bucket in rollup_buckets(row):
+            delta = deltas[(row["service_area_id"], dimension, bucket)]
+            delta[0] += 1
+            delta[1] += row["quantity"]
+    return deltas
+
+
+def upsert_statement(dialect: str):
+    if dialect == "mysql":
+        stmt = mysql_insert(OrderRollup)
+        return stmt.on_duplicate_key_update(
+            item_count=OrderRollup.item_count + stmt.inserted.item_count,
+            total_quantity=OrderRollup.total_quantity + stmt.inserted.total_quantity,
+        )
+    stmt = sqlite_insert(OrderRollup)
+    return stmt.on_conflict_do_update(
+        index_elements=["service_area_id", "dimension", "bucket"],
+        set_={
+            "item_count": OrderRollup.item_count + stmt.excluded.item_count,
+            "total_quantity": OrderRollup.total_quantity + stmt.excluded.total_quantity,
+        },
+    )
+
+
+def apply_deltas(db: Session, deltas):
+    # Runs inside the caller's transaction so totals commit with the orders.
+    # Keys are sorted so concurrent writers lock rollup rows in one order.
+    if not deltas:
+        return
+    params = [
+        {
+            "service_area_id": area_id,
+            "dimension": dimension,
+            "bucket": bucket,
+            "item_count": count,
+            "total_quantity": quantity,
+        }
+        for (area_id, dimension, bucket), (count, quantity) in sorted(deltas.items())
+    ]
+    db.execute(upsert_statement(db.get_bind().dialect.name), params)
+
+
+def apply_rollups(db: Session, rows):
+    apply_deltas(db, rollup_deltas(rows))
+
+
+def move_status(db: Session, rows, old: str, new: str):
+    # Moves the rows' counts from one status bucket to another
+    deltas = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        if row["service_area_id"] is None:
+            continue
+        for bucket, sign in ((old, -1), (new, 1)):
+            delta = deltas[(row["service_area_id"], "status", bucket)]
+            delta[0] += sign
+            delta[1] += sign * row["quantity"]
+    apply_deltas(db, deltas)
+
+
+def vendor_summary(db: Session, area_ids) -> dict:
+    summary = {dimension: {} for dimension in DIMENSIONS}
+    rows = db.execute(
+        select(
+            OrderRollup.dimension,
+            OrderRollup.bucket,
+            func.sum(OrderRollup.item_count),
+            func.sum(OrderRollup.total_quantity),
+        )
+        .where(OrderRollup.service_area_id.in_(area_ids))
+        .group_by(OrderRollup.dimension, OrderRollup.bucket)
+    )
+    for dimension, bucket, item_count, total_quantity in rows:
+        # Status buckets every order has moved out of
+        if not item_count:
+            continue
+        summary.setdefault(dimension, {})[bucket] = {
+            "items": int(item_count),
+            "quantity": float(total_quantity),
+        }
+    return summary
+
+
+def rebuild(db: Session, batch_size: int = 5000):
+    # Recompute every rollup from the order tables, walking orders by primary
+    # key. Orders created while this runs may be counted twice or not at all,
+    # so run it when writes are quiet.
+    db.execute(delete(OrderRollup))
+    last_id = b""
+    total = 0
+    while True:
+        headers = (
+            db.execute(
+                select(
+                    OrderHeader.id,
+                    OrderHeader.service_area_id,
+                    OrderHeader.pickup_date,
+                    OrderHeader.status,
+                )
+                .where(OrderHeader.id > last_id)
+                .order_by(OrderHeader.id)
+                .limit(batch_size)
+            )
+            .mappings()
+            .all()
+        )
+        if not headers:
+            break
+        by_id = {header["id"]: header for header in headers}
+        rows = [
+            dict(by_id[order_id], item_type=item_type, quantity=quantity)
+            for order_id, item_type, quantity in db.execute(
+                select(
+                    OrderItem.order_id, OrderItem.item_type, OrderItem.quantity
+                ).where(OrderItem.order_id.in_(list(by_id)))
+            )
+        ]
+        apply_rollups(db, rows)
+        db.commit()
+        last_id = headers[-1]["id"]
+        total += len(rows)
+    db.commit()
+    return total
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Recompute order rollups")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    catalog.load()
+    with SessionLocal() as session:
+        count = rebuild(session, args.batch_size)
+    print(f"Rebuilt rollups from {count} order items")
@@ -0,0 +1,292 @@
+import argparse
+import csv
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from areas import address_key
+from listing import uuid_str
+from models import Geocode, OrderHeader, OrderItem
+
+# Pickups in the same grid cell of this size form one cluster of the route
+ROUTE_CLUSTER_KM = float(os.getenv("ROUTE_CLUSTER_KM", "2.0"))
+# Wall-clock budget for 2-opt; nearest-neighbor always runs to completion
+ROUTE_TIME_BUDGET = float(os.getenv("ROUTE_TIME_BUDGET", "0.5"))
+ROUTE_MAX_PASSES = int(os.getenv("ROUTE_MAX_PASSES", "8"))
+# Fewer stops than this are routed as one path; clustering only pays off when
+# nearest-neighbor and 2-opt over every stop no longer fit the time budget
+ROUTE_CLUSTER_MIN_STOPS = int(os.getenv("ROUTE_CLUSTER_MIN_STOPS", "2000"))
+# Longest reversal the final 2-opt over a clustered route tries; it only has
+# to mend the seams between clusters
+ROUTE_SEAM_WINDOW = int(os.getenv("ROUTE_SEAM_WINDOW", "100"))
+# Share of the time budget for solving each cluster; the rest goes to that
+# final 2-opt
+CLUSTER_BUDGET_SHARE = 0.1
+GEOCODE_BATCH_SIZE = 1000
+EARTH_RADIUS_KM = 6371.0088
+
+
+def project(latlon: np.ndarray, lat0: float) -> np.ndarray:
+    # Equirectangular projection to km; accurate enough at city scale
+    rad = np.radians(latlon)
+    return EARTH_RADIUS_KM * np.column_stack(
+        (rad[:, 1] * np.cos(np.radians(lat0)), rad[:, 0])
+    )
+
+
+def nearest_neighbor(points: np.ndarray, origin: np.ndarray) -> np.ndarray:
+    remaining = np.arange(len(points))
+    rest = points.copy()
+    order = np.empty(len(points), dtype=np.intp)
+    current = origin
+    for k in range(len(points)):
+        diff = rest - current
+        i = int(np.argmin(np.einsum("ij,ij->i", diff, diff)))
+        order[k] = remaining[i]
+        current = rest[i].copy()
+        # Drop the visited stop by moving the last one into its slot
+        last = len(remaining) - 1
+        remaining[i] = remaining[last]
+        rest[i] = rest[last]
+        remaining = remaining[:last]
+        rest = rest[:last]
+    return order
+
+
+def two_opt(points, order, origin, deadline: float, window=None) -> np.ndarray:
+    # Open path with the origin pinned first. Each step tries every
+    # reversal starting after position i (of up to `window` stops) at once
+    # and takes the best one.
+    path = np.vstack((origin, points[order]))
+    route = np.concatenate(([-1], order))
+    n = len(path)
+    if n < 4:
+        return order
+    edges = np.hypot(*np.diff(path, axis=0).T)
+    for _ in range(ROUTE_MAX_PASSES):
+        improved = False
+        for i in range(n - 2):
+            a, b = path[i], path[i + 1]
+            end = n if window is None else min(n, i + 2 + window)
+            c = path[i + 2 : end]
+            cd = edges[i + 2 : end]
+            bd = np.hypot(*(path[i + 3 : end + 1] - b).T)
+            if end == n:
+                # The last stop has no outgoing edge to give up
+                cd = np.append(cd, 0.0)
+                bd = np.append(bd, 0.0)
+            ac = np.hypot(*(c - a).T)
+            delta = ac + bd - edges[i] - cd
+            j = int(np.argmin(delta))
+            if delta[j] < -1e-9:
+                k = i + 2 + j
+                path[i + 1 : k + 1] = path[i + 1 : k + 1][::-1].copy()
+                route[i + 1 : k + 1] = route[i + 1 : k + 1][::-1].copy()
+                edges[i + 1 : k] = edges[i + 1 : k][::-1].copy()
+                edges[i] = ac[j]
+                if k < n - 1:
+                    edges[k] = bd[j]
+                improved = True
+            if time.monotonic() > deadline:
+                return route[1:]
+        if not improved:
+            break
+    return route[1:]
+
+
+def solve_path(points: np.ndarray, origin, deadline: float) -> np.ndarray:
+    if origin is None:
+        # No depot: start from the stop farthest from the middle
+        middle = points.mean(axis=0)
+        origin = points[np.argmax(np.hypot(*(points - middle).T))]
+    return two_opt(points, nearest_neighbor(points, origin), origin, deadline)
+
+
+def cluster_labels(points: np.ndarray, cell_km: float) -> np.ndarray:
+    cells = np.floor(points / cell_km).astype(np.int64)
+    _, labels = np.unique(cells, axis=0, return_inverse=True)
+    return labels.reshape(-1)
+
+
+def plan_legs(points: np.ndarray, origin, deadline: float):
+    if len(points) < ROUTE_CLUSTER_MIN_STOPS:
+        return [solve_path(points, origin, deadline)]
+
+    # Visit clusters in route order, then the stops of each cluster starting
+    # from wherever the previous cluster ended. A 2-opt over the whole route
+    # then shortens the jumps between clusters.
+    start = time.monotonic()
+    legs_deadline = start + (deadline - start) * CLUSTER_BUDGET_SHARE
+    labels = cluster_labels(points, ROUTE_CLUSTER_KM)
+    counts = np.bincount(labels)
+    centroids = np.column_stack(
+        (
+            np.bincount(labels, weights=points[:, 0]) / counts,
+            np.bincount(labels, weights=points[:, 1]) / counts,
+        )
+    )
+    members = np.split(np.argsort(labels, kind="stable"), np.cumsum(counts)[:-1])
+    legs = []
+    position = origin
+    for cluster in solve_path(centroids, origin, legs_deadline):
+        stops = members[cluster]
+        leg = stops[solve_path(points[stops], position, legs_deadline)]
+        legs.append(leg)
+        position = points[leg[-1]]
+
+    tour = two_opt(points, np.concatenate(legs), origin, deadline, ROUTE_SEAM_WINDOW)
+    # A leg is a run of consecutive stops in the same cluster
+    seams = np.flatnonzero(np.diff(labels[tour])) + 1
+    return np.split(tour, seams)
+
+
+def path_length(points: np.ndarray, origin) -> float:
+    if origin is not None:
+        points = np.vstack((origin, points))
+    return float(np.hypot(*np.diff(points, axis=0).T).sum())
+
+
+def plan_stops(latlon: np.ndarray, origin_latlon=None):
+    # latlon is an (n, 2) array of stops. Returns the legs (arrays of stop
+    # indices, one per run of stops in a cluster) and the driving distance
+    # in km.
+    lat0 = float(latlon[:, 0].mean())
+    points = project(latlon, lat0)
+    origin = None
+    if origin_latlon is not None:
+        origin = project(np.array([origin_latlon], dtype=float), lat0)[0]
+    legs = plan_legs(points, origin, time.monotonic() + ROUTE_TIME_BUDGET)
+    return legs, path_length(points[np.concatenate(legs)], origin)
+
+
+def load_pickups(db: Session, area_ids, day: date) -> list:
+    # Orders for the same user, address and pickup time are one stop
+    start = datetime(day.year, day.month, day.day)
+    rows = db.execute(
+        select(
+            OrderHeader.id,
+            OrderHeader.user_id,
+            OrderHeader.user_name,
+            OrderHeader.pickup_date,
+            OrderHeader.pickup_address,
+            OrderItem.item_type,
+            OrderItem.quantity,
+        )
+        .join(OrderItem, OrderItem.order_id == OrderHeader.id)
+        .where(
+            OrderHeader.service_area_id.in_(area_ids),
+            OrderHeader.pickup_date >= start,
+            OrderHeader.pickup_date < start + timedelta(days=1),
+        )
+        .order_by(OrderHeader.pickup_date)
+    )
+    pickups = {}
+    for row in rows:
+        key = (row.user_id, row.pickup_address, row.pickup_date)
+        pickup = pickups.get(key)
+        if pickup is None:
+            pickup = pickups[key] = {
+                "user_name": row.user_name,
+                "pickup_address": row.pickup_address,
+                "pickup_date": row.pickup_date,
+                "order_ids": [],
+                "items": [],
+            }
+        order_id = uuid_str(row.id)
+        if order_id not in pickup["order_ids"]:
+            pickup["order_ids"].append(order_id)
+        pickup["items"].append({"item_type": row.item_type, "quantity": row.quantity})
+    return list(pickups.values())
+
+
+def geocode(db: Session, addresses) -> dict:
+    keys = list({address_key(address) for address in addresses})
+    coords = {}
+    for i in range(0, len(keys), GEOCODE_BATCH_SIZE):
+        rows = db.execute(
+            select(Geocode.key, Geocode.latitude, Geocode.longitude).where(
+                Geocode.key.in_(keys[i : i + GEOCODE_BATCH_SIZE])
+            )
+        )
+        for key, latitude, longitude in rows:
+            coords[key] = (latitude, longitude)
+    return coords
+
+
+def plan_route(db: Session, area_ids, day: date, origin_address: str | None) -> dict:
+    pickups = load_pickups(db, area_ids, day)
+    addresses = [pickup["pickup_address"] for pickup in pickups]
+    coords = geocode(db, addresses + ([origin_address] if origin_address else []))
+
+    located, unlocated = [], []
+    for pickup in pickups:
+        latlon = coords.get(address_key(pickup["pickup_address"]))
+        if latlon is None:
+            unlocated.append(pickup)
+            continue
+        pickup["latitude"], pickup["longitude"] = latlon
+        located.append(pickup)
+
+    clusters = []
+    distance = 0.0
+    if located:
+        origin = coords.get(address_key(origin_address)) if origin_address else None
+        legs, distance = plan_stops(
+            np.array([(p["latitude"], p["longitude"]) for p in located]), origin
+        )
+        clusters = [{"stops": [located[i] for i in leg]} for leg in legs]
+    return {
+        "status": "success",
+        "date": day.isoformat(),
+        "stops": len(located),
+        "distance_km": round(distance, 3),
+        "clusters": clusters,
+        "unlocated": unlocated,
+    }
+
+
+def import_geocodes(db: Session, rows) -> int:
+    # Upserts (address, latitude, longitude) rows; the last one for a key wins
+    batch = {}
+    total = 0
+
+    def flush():
+        db.execute(delete(Geocode).where(Geocode.key.in_(list(batch))))
+        db.execute(
+            insert(Geocode),
+            [
+                {"key": key, "latitude": latitude, "longitude": longitude}
+                for key, (latitude, longitude) in batch.items()
+            ],
+        )
+        db.commit()
+        batch.clear()
+
+    for address, latitude, longitude in rows:
+        batch[address_key(address)] = (float(latitude), float(longitude))
+        total += 1
+        if len(batch) >= GEOCODE_BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+    return total
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Manage the local geocode table")
+    parser.add_argument("command", choices=["import-geocodes"])
+    parser.add_argument("path", help="CSV file with address,latitude,longitude")
+    args = parser.parse_args()
+
+    with open(args.path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)  # header
+        with SessionLocal() as session:
+            count = import_geocodes(session, reader)
+    print(f"Imported {count} geocodes")
@@ -0,0 +1,251 @@
+import argparse
+import os
+import re
+
+from fastapi import HTTPException
+from sqlalchemy import and_, column, insert, or_, select, table, text
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+
+from listing import ORJSONResponse, load_items, page_response, select_orders
+from models import OrderHeader, OrderItem, OrderSearch
+
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+SEARCH_MAX_TERMS = int(os.getenv("SEARCH_MAX_TERMS", "8"))
+# Words a trailing prefix is spelled out as before falling back to a prefix
+# query, which merges the entries of every word it starts
+SEARCH_MAX_EXPANSIONS = int(os.getenv("SEARCH_MAX_EXPANSIONS", "16"))
+# Shorter searches match most of the index, and MySQL's ngram parser can't
+# match single characters at all
+MIN_TERM_LENGTH = 3
+
+# The FTS5 tables behind order_search on SQLite, see models.SEARCH_INDEX_DDL
+order_search_fts = table("order_search_fts", column("rowid"))
+order_search_vocab = table("order_search_vocab", column("term"), column("col"))
+
+# Words as the unicode61 tokenizer splits them
+WORD = re.compile(r"[^\W_]+")
+
+
+def search_document(pickup_address: str | None, item_types) -> str:
+    # One field per line, so a phrase never matches across two of them
+    return "\n".join([pickup_address or "", *dict.fromkeys(item_types)])
+
+
+def search_row(header: dict, items) -> dict:
+    return {
+        "order_id": header["id"],
+        "service_area_id": header["service_area_id"],
+        "order_date": header["order_date"],
+        "document": search_document(
+            header["pickup_address"], [item["item_type"] for item in items]
+        ),
+    }
+
+
+def index_orders(db: Session, rows):
+    # In the caller's transaction, like the rollups and events of the order
+    if rows:
+        db.execute(insert(OrderSearch), rows)
+
+
+def query_terms(q: str) -> list:
+    # Every term must match in the document: as a substring on MySQL, as
+    # whole words on SQLite (the last word may also be the start of one).
+    # Short words ("14", "b") are joined to a neighbour as a phrase
+    # ("sector 14").
+    terms = []
+    for word in q.split():
+        if terms and (len(word) < MIN_TERM_LENGTH or len(terms[-1]) < MIN_TERM_LENGTH):
+            terms[-1] = f"{terms[-1]} {word}"
+        else:
+            terms.append(word)
+    if not terms or len(terms[0]) < MIN_TERM_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Search needs at least {MIN_TERM_LENGTH} characters",
+        )
+    return terms[:SEARCH_MAX_TERMS]
+
+
+def phrase(words) -> str:
+    return '"%s"' % " ".join(words)
+
+
+def prefix_expansions(db: Session, word: str) -> list | None:
+    # Indexed words that start with `word` and are longer; None if there are
+    # too many to spell out
+    upper = word[:-1] + chr(ord(word[-1]) + 1)
+    rows = db.scalars(
+        select(order_search_vocab.c.term)
+        .where(
+            order_search_vocab.c.col == "document",
+            order_search_vocab.c.term > word,
+            order_search_vocab.c.term < upper,
+        )
+        .order_by(order_search_vocab.c.term)
+        .limit(SEARCH_MAX_EXPANSIONS + 1)
+    ).all()
+    return None if len(rows) > SEARCH_MAX_EXPANSIONS else rows
+
+
+def fts_tiers(db: Session, area_ids, terms: list) -> list:
+    # FTS5 queries in rank order: every term as a whole-word phrase, then
+    # the matches where the last word is only the start of a longer word
+    words = [term for term in (WORD.findall(t.lower()) for t in terms) if term]
+    if not words:
+        return []
+    areas = " OR ".join(str(int(area_id)) for area_id in area_ids)
+    exact = " AND ".join(phrase(term) for term in words)
+    tiers = [f"service_area_id : ({areas}) AND document : ({exact})"]
+    *head, last = words[-1]
+    expansions = prefix_expansions(db, last)
+    if expansions == []:
+        return tiers
+    if expansions is None:
+        prefixed = phrase(words[-1]) + " *"
+    else:
+        prefixed = " OR ".join(phrase([*head, word]) for word in expansions)
+    prefix = " AND ".join([*(phrase(term) for term in words[:-1]), f"({prefixed})"])
+    tiers.append(
+        f"service_area_id : ({areas}) AND document : ({prefix}) "
+        f"NOT document : ({exact})"
+    )
+    return tiers
+
+
+def fts_statement(query: str):
+    # Newest first: rowids follow the order documents were written in, and
+    # FTS5 walks them backwards without reading every match
+    return (
+        select(OrderSearch.order_id)
+        .join(order_search_fts, order_search_fts.c.rowid == OrderSearch.id)
+        .where(text("order_search_fts MATCH :query").bindparams(query=query))
+        .order_by(order_search_fts.c.rowid.desc())
+    )
+
+
+def search_tiers(db: Session, area_ids, terms: list) -> list:
+    # Statements whose results are concatenated, best matches first
+    if db.get_bind().dialect.name != "mysql":
+        return [fts_statement(query) for query in fts_tiers(db, area_ids, terms)]
+    # Relevance, then newest. Double quotes can't be escaped inside a
+    # boolean-mode phrase.
+    against = " ".join('+"%s"' % term.replace('"', " ") for term in terms)
+    relevance = match(OrderSearch.document, against=against).in_boolean_mode()
+    return [
+        select(OrderSearch.order_id)
+        .where(relevance, OrderSearch.service_area_id.in_(area_ids))
+        .order_by(
+            relevance.desc(), OrderSearch.order_date.desc(), OrderSearch.id.desc()
+        )
+    ]
+
+
+def encode_position(tier: int, offset: int) -> str:
+    return f"{tier}.{offset}"
+
+
+def decode_position(cursor: str | None):
+    # Results are ranked, not keyed: the cursor is a tier and an offset in it
+    if not cursor:
+        return 0, 0
+    tier, _, offset = cursor.partition(".")
+    if not (tier.isdigit() and offset.isdigit()):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return int(tier), int(offset)
+
+
+def search_order_ids(
+    db: Session, area_ids, q: str, limit: int, cursor: str | None = None
+):
+    # Up to `limit` order ids and the cursor of the next page, if any
+    terms = query_terms(q)
+    start, offset = decode_position(cursor)
+    if not area_ids:
+        return [], None
+    ids = []
+    tiers = search_tiers(db, area_ids, terms)
+    for tier in range(start, len(tiers)):
+        # One row past the page says whether there is a next one
+        rows = db.scalars(tiers[tier].limit(limit + 1 - len(ids)).offset(offset)).all()
+        ids += rows
+        if len(ids) > limit:
+            return ids[:limit], encode_position(tier, offset + len(rows) - 1)
+        offset = 0
+    return ids, None
+
+
+def search_orders(
+    db: Session, area_ids, q: str, limit: int, cursor: str | None
+) -> ORJSONResponse:
+    # The page in rank order, shaped like the vendor listing. Sync only; the
+    # async routes call it through run_sync.
+    ids, next_cursor = search_order_ids(db, area_ids, q, limit, cursor)
+    rows = {
+        row.id: row
+        for row in db.execute(select_orders().where(OrderHeader.id.in_(ids)))
+    }
+    rows = [rows[order_id] for order_id in ids if order_id in rows]
+    return page_response(rows, load_items(db, ids), next_cursor)
+
+
+def index_missing(db: Session, batch_size: int = 5000) -> int:
+    # Writes documents for orders that have none, e.g. those placed before
+    # migration 0008 or copied by backfill.py. Oldest first, so search
+    # results stay newest first. Safe to re-run.
+    after = None
+    indexed = 0
+    while True:
+        stmt = (
+            select(
+                OrderHeader.id,
+                OrderHeader.service_area_id,
+                OrderHeader.order_date,
+                OrderHeader.pickup_address,
+            )
+            .outerjoin(OrderSearch, OrderSearch.order_id == OrderHeader.id)
+            .where(OrderSearch.id.is_(None))
+        )
+        if after is not None:
+            order_date, order_id = after
+            stmt = stmt.where(
+                or_(
+                    OrderHeader.order_date > order_date,
+                    and_(
+                        OrderHeader.order_date == order_date,
+                        OrderHeader.id > order_id,
+                    ),
+                )
+            )
+        headers = db.execute(
+            stmt.order_by(OrderHeader.order_date, OrderHeader.id).limit(batch_size)
+        ).all()
+        if not headers:
+            return indexed
+        items = {header.id: [] for header in headers}
+        for order_id, item_type in db.execute(
+            select(OrderItem.order_id, OrderItem.item_type).where(
+                OrderItem.order_id.in_(items)
+            )
+        ):
+            items[order_id].append({"item_type": item_type})
+        index_orders(
+            db, [search_row(header._asdict(), items[header.id]) for header in headers]
+        )
+        db.commit()
+        indexed += len(headers)
+        after = (headers[-1].order_date, headers[-1].id)
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain the order search index")
+    parser.add_argument("command", choices=["index"])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        count = index_missing(session, args.batch_size)
+    print(f"Indexed {count} orders")
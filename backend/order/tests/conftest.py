@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The service imports its modules top-level (`from models import ...`), as it
+# does when run from backend/order; point the engines at SQLite before any
+# of them are imported
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
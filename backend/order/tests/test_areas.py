@@ -0,0 +1,72 @@
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+import areas
+from areas import area_key, assign_areas, resolve_area_id, vendor_area_ids
+from models import Base, ServiceArea, VendorServiceArea
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(
+        engine, tables=[ServiceArea.__table__, VendorServiceArea.__table__]
+    )
+    areas._area_ids.clear()
+    with Session(engine) as session:
+        yield session
+    areas._area_ids.clear()
+    engine.dispose()
+
+
+@pytest.mark.parametrize(
+    "address, key",
+    [
+        ("House 9, Lane 3, Sector 14, Gurgaon", "sector 14 gurgaon"),
+        ("Shop 4,  sector 14 , GURGAON.", "sector 14 gurgaon"),
+        ("12 MG Road, Bengaluru 560001", "560001"),
+        ("Flat 2, Indiranagar, Bengaluru - 560 038", "560038"),
+        ("3 Market Road", "3 market road"),
+    ],
+)
+def test_area_key(address, key):
+    assert area_key(address) == key
+
+
+def test_addresses_in_one_locality_share_an_area(db):
+    first = resolve_area_id(db, "House 9, Lane 3, Sector 14, Gurgaon")
+    second = resolve_area_id(db, "Shop 4, Sector 14, Gurgaon")
+    other = resolve_area_id(db, "Shop 4, Sector 15, Gurgaon")
+    assert first == second
+    assert other != first
+
+
+def test_vendor_without_mapping_serves_its_own_area(db):
+    area_id = resolve_area_id(db, "House 9, Sector 14, Gurgaon")
+    vendor = uuid4().bytes
+    assert vendor_area_ids(db, vendor, "Shop 1, Sector 14, Gurgaon") == [area_id]
+    assert vendor_area_ids(db, vendor, "Shop 1, Sector 99, Gurgaon") == []
+
+
+def test_assign_areas(db):
+    vendor = uuid4().bytes
+    sector_14 = resolve_area_id(db, "House 9, Sector 14, Gurgaon")
+
+    assigned = assign_areas(db, vendor, ["Sector 14, Gurgaon", "122018"])
+    pin = db.execute(select(ServiceArea.id).where(ServiceArea.key == "122018"))
+    assert assigned == sorted([sector_14, pin.scalar()])
+    # The mapping replaces the fallback to the vendor's own address
+    assert sorted(vendor_area_ids(db, vendor, "Shop 1, Sector 99, Gurgaon")) == (
+        assigned
+    )
+
+    # Assigning again adds without duplicating
+    assert assign_areas(db, vendor, ["sector 14, gurgaon"]) == assigned
+
+    assert assign_areas(db, vendor, ["Sector 14, Gurgaon"], replace=True) == [
+        sector_14
+    ]
+    assert vendor_area_ids(db, vendor, None) == [sector_14]
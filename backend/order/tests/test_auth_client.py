@@ -0,0 +1,151 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from identity import AuthClient, CircuitBreaker
+
+BASE_URL = "http://auth.test"
+IDENTITY = {"user_id": "a1b2", "address": "1 Market Road"}
+
+
+class StubAuth:
+    # Stands in for the auth service's /me endpoints. Requests wait on `gate`
+    # when it is set, so a test can keep lookups in flight.
+    def __init__(self, status_code: int = 200):
+        self.status_code = status_code
+        self.calls = 0
+        self.breaker_states = []
+        self.gate = None
+        self.client = None
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        self.breaker_states.append(self.client.breaker.state)
+        if self.gate is not None:
+            await self.gate.wait()
+        return httpx.Response(self.status_code, json=IDENTITY)
+
+
+def make_client(stub: StubAuth, threshold: int = 2) -> AuthClient:
+    client = AuthClient(BASE_URL, CircuitBreaker(threshold, reset_timeout=60))
+    client._client = httpx.AsyncClient(
+        base_url=BASE_URL, transport=httpx.MockTransport(stub)
+    )
+    stub.client = client
+    return client
+
+
+def expire_open_state(breaker: CircuitBreaker):
+    breaker.opened_at -= breaker.reset_timeout
+
+
+def test_concurrent_lookups_share_one_request():
+    async def run():
+        stub = StubAuth()
+        stub.gate = asyncio.Event()
+        client = make_client(stub)
+        lookups = [
+            asyncio.ensure_future(client.fetch_identity("token", "vendor"))
+            for _ in range(20)
+        ]
+        await asyncio.sleep(0)
+        stub.gate.set()
+        results = await asyncio.gather(*lookups)
+        await client.close()
+        return stub, results
+
+    stub, results = asyncio.run(run())
+    assert stub.calls == 1
+    assert results == [IDENTITY] * 20
+
+
+def test_lookups_for_different_tokens_are_not_shared():
+    async def run():
+        stub = StubAuth()
+        client = make_client(stub)
+        await asyncio.gather(
+            client.fetch_identity("token-a", "vendor"),
+            client.fetch_identity("token-b", "vendor"),
+            client.fetch_identity("token-a", "user"),
+        )
+        await client.close()
+        return stub
+
+    assert asyncio.run(run()).calls == 3
+
+
+def test_cancelled_caller_does_not_cancel_shared_lookup():
+    async def run():
+        stub = StubAuth()
+        stub.gate = asyncio.Event()
+        client = make_client(stub)
+        first = asyncio.ensure_future(client.fetch_identity("token", "vendor"))
+        second = asyncio.ensure_future(client.fetch_identity("token", "vendor"))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        stub.gate.set()
+        result = await second
+        await client.close()
+        return stub, first, result
+
+    stub, first, result = asyncio.run(run())
+    assert first.cancelled()
+    assert result == IDENTITY
+    assert stub.calls == 1
+
+
+def test_breaker_opens_probes_and_closes():
+    async def run():
+        stub = StubAuth(status_code=500)
+        client = make_client(stub, threshold=2)
+        breaker = client.breaker
+        states = [breaker.state]
+
+        for _ in range(2):
+            with pytest.raises(HTTPException) as failure:
+                await client.fetch_identity("token", "vendor")
+            assert failure.value.status_code == 503
+        states.append(breaker.state)
+
+        # Open: shed without reaching the auth service
+        with pytest.raises(HTTPException) as shed:
+            await client.fetch_identity("token", "vendor")
+        assert shed.value.status_code == 503
+        assert stub.calls == 2
+
+        # After the reset timeout a single probe goes through; it succeeds
+        expire_open_state(breaker)
+        stub.status_code = 200
+        assert await client.fetch_identity("token", "vendor") == IDENTITY
+        states.append(breaker.state)
+        await client.close()
+        return stub, states
+
+    stub, states = asyncio.run(run())
+    assert states == ["closed", "open", "closed"]
+    assert stub.breaker_states == ["closed", "closed", "half_open"]
+    assert stub.calls == 3
+
+
+def test_failed_probe_reopens_breaker():
+    async def run():
+        stub = StubAuth(status_code=500)
+        client = make_client(stub, threshold=1)
+        with pytest.raises(HTTPException):
+            await client.fetch_identity("token", "vendor")
+        expire_open_state(client.breaker)
+        with pytest.raises(HTTPException):
+            await client.fetch_identity("token", "vendor")
+        state = client.breaker.state
+        with pytest.raises(HTTPException):
+            await client.fetch_identity("token", "vendor")
+        await client.close()
+        return stub, state
+
+    stub, state = asyncio.run(run())
+    assert state == "open"
+    assert stub.breaker_states == ["closed", "half_open"]
+    assert stub.calls == 2
@@ -0,0 +1,21 @@
+from invoices import pdf_hash, render_invoice
+
+INVOICE = {
+    "user": "user0",
+    "pickup_address": "House 9, Sector 14, Gurgaon",
+    "pickup_date": "2026-10-18T10:00:00",
+    "generated_on": "2026-10-17T09:30:12.123456",
+    "items": [{"item_type": "Copper", "quantity": 2.0}],
+}
+
+
+def test_rendering_is_deterministic():
+    first = render_invoice(INVOICE)
+    assert first.startswith(b"%PDF")
+    assert render_invoice(dict(INVOICE)) == first
+    assert b"/CreationDate (D:20261017093012Z)" in first
+
+
+def test_generated_on_changes_the_content_hash():
+    later = dict(INVOICE, generated_on="2026-10-17T09:31:00")
+    assert pdf_hash(render_invoice(later)) != pdf_hash(render_invoice(INVOICE))
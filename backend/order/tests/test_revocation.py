@@ -0,0 +1,28 @@
+import asyncio
+import logging
+
+import revocation
+from revocation import RevocationList
+
+
+def test_failed_syncs_are_logged_counted_and_go_stale(monkeypatch, caplog):
+    def unavailable(after, limit):
+        raise ConnectionError("database unavailable")
+
+    async def run(revocations: RevocationList):
+        task = asyncio.create_task(revocations._run())
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    monkeypatch.setattr(revocation, "revocations_after", unavailable)
+    revocations = RevocationList(interval=0.01)
+    with caplog.at_level(logging.ERROR, logger="revocation"):
+        asyncio.run(run(revocations))
+
+    assert revocations.sync_failures > 0
+    assert "Revocation list sync failed" in caplog.text
+    assert revocations.stale()
+
+    monkeypatch.setattr(revocation, "revocations_after", lambda after, limit: [])
+    revocations.sync()
+    assert not revocations.stale()
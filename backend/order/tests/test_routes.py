@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+import routes
+from routes import nearest_neighbor, path_length, plan_stops, project
+
+
+@pytest.mark.parametrize("min_stops", [0, 10000])
+def test_route_is_no_longer_than_nearest_neighbor(monkeypatch, min_stops):
+    # min_stops=0 clusters every route, 10000 routes all stops as one path
+    monkeypatch.setattr(routes, "ROUTE_CLUSTER_MIN_STOPS", min_stops)
+    generator = np.random.default_rng(7)
+    latlon = np.column_stack(
+        (28.4 + generator.random(500) * 0.3, 77.0 + generator.random(500) * 0.3)
+    )
+    origin_latlon = (28.55, 77.15)
+
+    legs, distance = plan_stops(latlon, origin_latlon)
+
+    tour = np.concatenate(legs)
+    assert sorted(tour) == list(range(len(latlon)))
+    lat0 = float(latlon[:, 0].mean())
+    points = project(latlon, lat0)
+    origin = project(np.array([origin_latlon]), lat0)[0]
+    assert distance == pytest.approx(path_length(points[tour], origin))
+    assert distance <= path_length(points[nearest_neighbor(points, origin)], origin)
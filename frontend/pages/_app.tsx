@@ -1,7 +1,62 @@
+import axios from "axios";
 import type { AppProps } from "next/app";
 import React from "react";
 import "../styles/globals.css";
 
+const AUTH_URL = "http://localhost:8001";
+
+// Access tokens are short-lived. On a 401 trade the refresh token for a new
+// pair once and retry; concurrent failures share that single refresh, since
+// each refresh token only works once.
+let refreshing: Promise<string | null> | null = null;
+
+function refreshAccessToken(): Promise<string | null> {
+  const refreshToken = localStorage.getItem("refreshToken");
+  if (!refreshToken) {
+    return Promise.resolve(null);
+  }
+  if (!refreshing) {
+    refreshing = axios
+      .post(`${AUTH_URL}/token/refresh`, { refresh_token: refreshToken })
+      .then((response) => {
+        localStorage.setItem("token", response.data.access_token);
+        localStorage.setItem("refreshToken", response.data.refresh_token);
+        return response.data.access_token as string;
+      })
+      .catch(() => {
+        localStorage.removeItem("token");
+        localStorage.removeItem("refreshToken");
+        return null;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+}
+
+if (typeof window !== "undefined") {
+  axios.interceptors.response.use(undefined, async (error) => {
+    const config = error.config;
+    if (
+      error.response?.status !== 401 ||
+      !config ||
+      config._retried ||
+      config.url?.endsWith("/token/refresh") ||
+      !config.headers?.Authorization
+    ) {
+      return Promise.reject(error);
+    }
+    const token = await refreshAccessToken();
+    if (!token) {
+      return Promise.reject(error);
+    }
+    config._retried = true;
+    config.headers.Authorization = `Bearer ${token}`;
+    return axios(config);
+  });
+}
+
 export default function MyApp({ Component, pageProps }: AppProps) {
   return <Component {...pageProps} />;
 }
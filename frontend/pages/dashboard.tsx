@@ -24,6 +24,7 @@ export default function Dashboard() {
   const [showOrdersMenu, setShowOrdersMenu] = useState(false);
   const [showPastOrders, setShowPastOrders] = useState(false);
   const [orders, setOrders] = useState([]);
+  const [searchQuery, setSearchQuery] = useState("");
   const [showCreateOrder, setShowCreateOrder] = useState(false);
   const [itemsData, setItemsData] = useState<any[]>([]);
   const [selectedItems, setSelectedItems] = useState<{ [key: string]: number }>(
@@ -105,6 +106,29 @@ export default function Dashboard() {
     }
   };
 
+  // Vendors search their areas' orders by address or item; an empty search
+  // goes back to the full listing
+  const handleSearchOrders = async (e: React.FormEvent) => {
+    e.preventDefault();
+    if (!searchQuery.trim()) {
+      handleGetPastOrders();
+      return;
+    }
+    const token = localStorage.getItem("token");
+    try {
+      const response = await axios.get(
+        "http://localhost:8002/vendor/order/search",
+        {
+          params: { q: searchQuery },
+          headers: { Authorization: `Bearer ${token}` },
+        }
+      );
+      setOrders(response.data.orders || []);
+    } catch (err) {
+      setOrders([]);
+    }
+  };
+
   const handleShowCreateOrder = async () => {
     setShowCreateOrder(true);
     setShowPastOrders(false);
@@ -158,13 +182,24 @@ export default function Dashboard() {
           headers: { Authorization: `Bearer ${token}` },
         },
       );
-      const base64String = response.data.invoice_base64;
-      const byteCharacters = atob(base64String);
-      const byteNumbers = new Array(byteCharacters.length)
-        .fill(0)
-        .map((_, i) => byteCharacters.charCodeAt(i));
-      const byteArray = new Uint8Array(byteNumbers);
-      const blob = new Blob([byteArray], { type: "application/pdf" });
+      // The invoice is rendered in the background; poll until it is ready
+      const invoiceUrl = `http://localhost:8002/order/${response.data.invoice_id}/invoice`;
+      const fetchInvoice = () =>
+        axios.get(invoiceUrl, {
+          headers: { Authorization: `Bearer ${token}` },
+          responseType: "blob",
+        });
+      let invoice = await fetchInvoice();
+      let attempts = 0;
+      while (invoice.status === 202 && attempts < 20) {
+        attempts += 1;
+        await new Promise((resolve) => setTimeout(resolve, 500));
+        invoice = await fetchInvoice();
+      }
+      if (invoice.status !== 200) {
+        throw new Error("Invoice is not ready");
+      }
+      const blob = new Blob([invoice.data], { type: "application/pdf" });
 
       const link = document.createElement("a");
       link.href = URL.createObjectURL(blob);
@@ -203,7 +238,18 @@ export default function Dashboard() {
           <span className="text-indigo-700 font-bold text-lg">Dashboard</span>
           <span className="text-gray-300 text-xl">|</span>
           <button
-            onClick={() => {
+            onClick={async () => {
+              const token = localStorage.getItem("token");
+              if (token) {
+                // Revoke both tokens; log out locally even if this fails
+                await axios
+                  .post(
+                    "http://localhost:8001/logout",
+                    { refresh_token: localStorage.getItem("refreshToken") },
+                    { headers: { Authorization: `Bearer ${token}` } },
+                  )
+                  .catch(() => undefined);
+              }
               localStorage.clear();
               router.push("/");
             }}
@@ -252,6 +298,23 @@ export default function Dashboard() {
             <h2 className="text-3xl font-extrabold mb-8 text-indigo-700 border-b-2 border-indigo-100 pb-3 tracking-tight">
               Past Orders
             </h2>
+            {(userRole === "vendor" || userRole === "support_vendor") && (
+              <form onSubmit={handleSearchOrders} className="flex gap-3 mb-8">
+                <input
+                  type="search"
+                  value={searchQuery}
+                  onChange={(e) => setSearchQuery(e.target.value)}
+                  placeholder="Search by address or item, e.g. sector 14"
+                  className="flex-1 border border-indigo-200 rounded-xl px-4 py-2 focus:outline-none focus:ring-2 focus:ring-indigo-400"
+                />
+                <button
+                  type="submit"
+                  className="bg-indigo-500 text-white px-6 py-2 rounded-xl hover:bg-indigo-600 transition-all font-semibold"
+                >
+                  Search
+                </button>
+              </form>
+            )}
             {orders.length === 0 ? (
               <p className="text-gray-500 text-lg">No orders found.</p>
             ) : (
@@ -261,20 +324,25 @@ export default function Dashboard() {
                     key={order.order_id}
                     className="border border-indigo-100 rounded-2xl p-6 bg-indigo-50 shadow-md hover:shadow-xl transition-all animate-fade-in"
                   >
-                    <div className="flex flex-col md:flex-row md:gap-10 gap-3">
-                      <div className="flex-1">
-                        <span className="font-semibold text-gray-700">
-                          Item:
-                        </span>{" "}
-                        {order.item_type}
-                      </div>
-                      <div className="flex-1">
-                        <span className="font-semibold text-gray-700">
-                          Quantity:
-                        </span>{" "}
-                        {order.quantity} Kgs
+                    {order.items.map((item: any) => (
+                      <div
+                        key={item.item_id}
+                        className="flex flex-col md:flex-row md:gap-10 gap-3"
+                      >
+                        <div className="flex-1">
+                          <span className="font-semibold text-gray-700">
+                            Item:
+                          </span>{" "}
+                          {item.item_type}
+                        </div>
+                        <div className="flex-1">
+                          <span className="font-semibold text-gray-700">
+                            Quantity:
+                          </span>{" "}
+                          {item.quantity} Kgs
+                        </div>
                       </div>
-                    </div>
+                    ))}
                     <div className="flex flex-col md:flex-row md:gap-10 gap-3 mt-2">
                       <div className="flex-1">
                         <span className="font-semibold text-gray-700">
@@ -276,6 +276,7 @@ export default function Home() {
             },
           );
           localStorage.setItem("token", response.data.access_token);
+          localStorage.setItem("refreshToken", response.data.refresh_token);
           localStorage.setItem(
             "username",
             response.data.name || formData.username,
@@ -293,6 +294,7 @@ export default function Home() {
             },
           );
           localStorage.setItem("token", response.data.access_token);
+          localStorage.setItem("refreshToken", response.data.refresh_token);
           localStorage.setItem("username", formData.username);
           localStorage.setItem("userType", response.data.role);
           router.push("/dashboard");